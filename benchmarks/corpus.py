@@ -0,0 +1,116 @@
+"""
+Synthetic Gherkin corpus
+
+Deterministic generator of feature files for the benchmarks. The same
+parameters and seed always give the same corpus.
+"""
+import io
+import os
+import random
+from farmer.language import LANGUAGE
+
+WORDS = ("user account order invoice payment basket product search page "
+         "report admin email password token session cart price item list "
+         "request response server client queue message file record").split()
+
+
+def keyword(lang, key):
+    """First spelling of a keyword in a language, other than `*`"""
+    return [spelling.strip() for spelling in LANGUAGE[lang][key]
+            if spelling.strip() != "*"][0]
+
+
+class Corpus(object):
+    def __init__(self, files=10, scenarios=20, steps=6, tags=2, tables=0.2,
+                 table_rows=5, multilines=0.1, languages=("en",), seed=0):
+        self.files = files
+        # per feature
+        self.scenarios = scenarios
+        # per scenario
+        self.steps = steps
+        self.tags = tags
+        # share of steps carrying a table or a multiline block
+        self.tables = tables
+        self.table_rows = table_rows
+        self.multilines = multilines
+        self.languages = list(languages)
+        self.seed = seed
+
+    def parameters(self):
+        return {
+            "files": self.files,
+            "scenarios": self.scenarios,
+            "steps": self.steps,
+            "tags": self.tags,
+            "tables": self.tables,
+            "table_rows": self.table_rows,
+            "multilines": self.multilines,
+            "languages": self.languages,
+            "seed": self.seed,
+        }
+
+    def sentence(self, rand, words=4):
+        return " ".join(rand.choice(WORDS) for _ in range(words))
+
+    def tag_line(self, rand, indent):
+        names = ["@%s_%d" % (rand.choice(WORDS), rand.randint(0, 9))
+                 for _ in range(self.tags)]
+        return indent + " ".join(names)
+
+    def feature(self, number):
+        """Lines of the feature file number `number`"""
+        rand = random.Random("%s:%s" % (self.seed, number))
+        lang = self.languages[number % len(self.languages)]
+        step_keys = ["given", "when", "then", "and", "but"]
+        lines = []
+        if lang != "en":
+            lines.append("# language: %s" % lang)
+        if self.tags:
+            lines.append(self.tag_line(rand, ""))
+        lines.append("%s: %s %d" % (keyword(lang, "feature"),
+                                    self.sentence(rand, 3), number))
+        lines.append("  %s" % self.sentence(rand, 8))
+        lines.append("  %s" % self.sentence(rand, 8))
+        lines.append("")
+        lines.append("  %s:" % keyword(lang, "background"))
+        lines.append("    %s %s" % (keyword(lang, "given"),
+                                    self.sentence(rand)))
+        for scenario in range(self.scenarios):
+            lines.append("")
+            if self.tags:
+                lines.append(self.tag_line(rand, "  "))
+            lines.append("  %s: %s %d" % (keyword(lang, "scenario"),
+                                          self.sentence(rand, 3), scenario))
+            for step in range(self.steps):
+                key = step_keys[min(step, len(step_keys) - 1)]
+                lines.append("    %s %s" % (keyword(lang, key),
+                                            self.sentence(rand)))
+                chance = rand.random()
+                if chance < self.tables:
+                    for row in range(self.table_rows):
+                        lines.append("      | %s | %s | %d |" % (
+                            rand.choice(WORDS), rand.choice(WORDS), row))
+                elif chance < self.tables + self.multilines:
+                    lines.append('      """')
+                    lines.append("      %s" % self.sentence(rand, 10))
+                    lines.append("      %s" % self.sentence(rand, 10))
+                    lines.append('      """')
+            if rand.random() < 0.1:
+                lines.append("    # %s" % self.sentence(rand))
+        return lines
+
+    def __iter__(self):
+        for number in range(self.files):
+            yield self.feature(number)
+
+    def write(self, directory):
+        """Write the corpus as .feature files, returning their paths"""
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        paths = []
+        for number, lines in enumerate(self):
+            path = os.path.join(directory, "generated_%05d.feature" % number)
+            with io.open(path, "w", encoding="utf-8") as handle:
+                handle.write("\n".join(lines) + "\n")
+            paths.append(path)
+        return paths
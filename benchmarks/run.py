@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""
+Lexer and parser benchmarks
+
+Times Lexer.tokenize, on lines in memory, on files read as text and on
+memory mapped files, Parser.parse_lex, the whole lex and parse pipeline and
+loading the binary format, in full and headers only, over a synthetic
+corpus, and measures the peak memory of the pipeline.
+Results can be saved as a JSON baseline and later runs compared to it:
+
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --compare baseline.json
+"""
+import argparse
+import gc
+import json
+import os
+import io
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import Corpus
+from farmer.lexer import Lexer
+from farmer.parser import Parser
+from farmer.serialize import dumps, loads
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+def best_of(repeat, function, *args):
+    """Best wall clock time of `repeat` calls of function"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = timer()
+        function(*args)
+        timings.append(timer() - start)
+    return min(timings)
+
+
+def tokenize_all(files):
+    for lines in files:
+        Lexer().tokenize(lines)
+
+
+def read_and_tokenize_all(paths):
+    for path in paths:
+        with io.open(path, encoding="utf-8") as handle:
+            Lexer().tokenize(handle)
+
+
+def tokenize_file_all(paths):
+    for path in paths:
+        Lexer().tokenize_file(path)
+
+
+def parse_lex_all(element_lists):
+    for elements in element_lists:
+        Parser().parse_lex(elements)
+
+
+def parse_all(files):
+    for lines in files:
+        Parser().parse(lines)
+
+
+def loads_all(encoded):
+    for data in encoded:
+        loads(data)
+
+
+def loads_headers_all(encoded):
+    for data in encoded:
+        loads(data, headers_only=True)
+
+
+def peak_memory(function, *args):
+    """Peak bytes allocated while function runs, or None when tracemalloc is
+    not available"""
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(corpus, repeat=3):
+    files = list(corpus)
+    line_count = sum(len(lines) for lines in files)
+    element_lists = [list(Lexer().iter_elements(lines)) for lines in files]
+    encoded = [dumps(Parser().parse(lines)) for lines in files]
+    directory = tempfile.mkdtemp()
+    paths = corpus.write(directory)
+    benchmarks = [
+        ("tokenize", tokenize_all, files),
+        ("read_tokenize", read_and_tokenize_all, paths),
+        ("tokenize_file", tokenize_file_all, paths),
+        ("parse_lex", parse_lex_all, element_lists),
+        ("end_to_end", parse_all, files),
+        ("loads", loads_all, encoded),
+        ("loads_headers", loads_headers_all, encoded),
+    ]
+    results = {}
+    try:
+        for name, function, argument in benchmarks:
+            seconds = best_of(repeat, function, argument)
+            results[name] = {
+                "seconds": seconds,
+                "lines_per_sec": line_count / seconds if seconds else None,
+            }
+    finally:
+        shutil.rmtree(directory)
+    results["end_to_end"]["peak_memory"] = peak_memory(parse_all, files)
+    return {
+        "corpus": corpus.parameters(),
+        "lines": line_count,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Print the change of every benchmark against a baseline report and
+    return whether any of them slowed down by more than threshold"""
+    regressed = False
+    if baseline.get("corpus") != report["corpus"]:
+        print("warning: the baseline was measured on a different corpus")
+    for name, result in sorted(report["results"].items()):
+        before = baseline["results"].get(name)
+        if not before or not before["lines_per_sec"]:
+            continue
+        ratio = result["lines_per_sec"] / before["lines_per_sec"]
+        flag = ""
+        if ratio < 1 - threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print("%-14s %12.0f lines/s  (%+.1f%% vs baseline)%s" % (
+            name, result["lines_per_sec"], (ratio - 1) * 100, flag))
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--scenarios", type=int, default=40)
+    parser.add_argument("--steps", type=int, default=6)
+    parser.add_argument("--tags", type=int, default=2)
+    parser.add_argument("--tables", type=float, default=0.2)
+    parser.add_argument("--table-rows", type=int, default=5)
+    parser.add_argument("--multilines", type=float, default=0.1)
+    parser.add_argument("--languages", default="en",
+                        help="comma separated language codes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", metavar="PATH",
+                        help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH",
+                        help="compare the results with a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown reported as a regression")
+    parser.add_argument("--write-corpus", metavar="DIRECTORY",
+                        help="also write the corpus as .feature files")
+    args = parser.parse_args(argv)
+
+    corpus = Corpus(files=args.files, scenarios=args.scenarios,
+                    steps=args.steps, tags=args.tags, tables=args.tables,
+                    table_rows=args.table_rows, multilines=args.multilines,
+                    languages=args.languages.split(","), seed=args.seed)
+    if args.write_corpus:
+        corpus.write(args.write_corpus)
+    report = run(corpus, args.repeat)
+
+    print("%d lines in %d files" % (report["lines"], args.files))
+    for name, result in sorted(report["results"].items()):
+        print("%-14s %8.3fs %12.0f lines/s" % (
+            name, result["seconds"], result["lines_per_sec"]))
+    peak = report["results"]["end_to_end"]["peak_memory"]
+    if peak is not None:
+        print("peak memory    %.1f MiB" % (peak / 1024.0 / 1024.0))
+
+    if args.save:
+        with open(args.save, "w") as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
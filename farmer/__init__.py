@@ -0,0 +1,4 @@
+__version__ = "0.1.0"
+
+from .batch import parse_paths
+from .compare import diff
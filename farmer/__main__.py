@@ -0,0 +1,64 @@
+"""
+Farmer's command line
+
+    python -m farmer serve SOCKET PATH...    keep a suite parsed, see server
+    python -m farmer query SOCKET METHOD [PARAMS]
+    python -m farmer lint PATH...            check the structure of files
+"""
+import argparse
+import json
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="farmer",
+                                     description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command")
+
+    serve = commands.add_parser("serve", help="serve a parsed suite on a "
+                                "Unix socket")
+    serve.add_argument("socket")
+    serve.add_argument("paths", nargs="+",
+                       help="feature files, directories or globs")
+    serve.add_argument("--interval", type=float, default=1.0,
+                       help="seconds between two scans of the files")
+    serve.add_argument("--cache", help="parse cache directory")
+    serve.add_argument("--workers", type=int,
+                       help="processes parsing the files, one per cpu by "
+                       "default")
+
+    query = commands.add_parser("query", help="send a request to a server")
+    query.add_argument("socket")
+    query.add_argument("method")
+    query.add_argument("params", nargs="?", default="{}",
+                       help="JSON object of the method parameters")
+
+    lint = commands.add_parser("lint", help="check the structure of "
+                               "feature files")
+    lint.add_argument("paths", nargs="+")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        from .server import serve
+        serve(args.socket, args.paths, args.interval, args.cache,
+              args.workers)
+    elif args.command == "query":
+        from .server import RequestError, request
+        try:
+            result = request(args.socket, args.method,
+                             **json.loads(args.params))
+        except RequestError as error:
+            print(error)
+            return 1
+        print(json.dumps(result, indent=2, sort_keys=True))
+    elif args.command == "lint":
+        from .validate import main as lint_main
+        return lint_main(args.paths)
+    else:
+        parser.print_help()
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Farmer's asyncio front-end
+
+Parse feature files from inside an event loop without stalling it.
+parse_stream lexes an asynchronous byte stream as it arrives; parse_many
+parses files in an executor, a bounded number of batches at a time.
+Requires Python 3.7 or later.
+"""
+import asyncio
+from multiprocessing import cpu_count
+from .batch import expand_paths, parse_file
+from .lexer import Lexer
+from .parser import Parser
+
+# bytes lexed between two returns to the event loop, so a stream whose data
+# is already buffered does not hold the loop for its whole length
+YIELD_EVERY = 64 * 1024
+# bytes asked for by a read of a stream
+READ_SIZE = 64 * 1024
+
+
+async def iter_chunks(reader):
+    """Yield the data of reader as byte chunks. reader is either an object
+    with a read coroutine, like asyncio.StreamReader, or an async iterable
+    of byte chunks split anywhere. Chunks are not split on lines, so lines
+    are not bound by the line limit of a StreamReader."""
+    if hasattr(reader, "read"):
+        while True:
+            chunk = await reader.read(READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    async for chunk in reader:
+        yield chunk
+
+
+async def parse_stream(reader, lang="en", encoding="utf-8", executor=None):
+    """Parse the features of an asynchronous byte stream, see iter_chunks.
+
+    Data is pushed into the lexer as it is read, and the tree is built in
+    executor, the default executor of the loop when None.
+    """
+    lexer = Lexer(lang)
+    lexer.start_feed(elements=True, encoding=encoding)
+    elements = []
+    size = 0
+    async for chunk in iter_chunks(reader):
+        elements.extend(lexer.feed(chunk))
+        size += len(chunk)
+        if size >= YIELD_EVERY:
+            size = 0
+            await asyncio.sleep(0)
+    elements.extend(lexer.close())
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, Parser(lexer).parse_lex,
+                                      elements)
+
+
+def parse_batch(paths, cache=None):
+    """Parse a few files, returning their ParseResults. The unit of work sent
+    to the executor by parse_many."""
+    return [parse_file(path, cache) for path in paths]
+
+
+async def parse_many(paths_or_globs, executor=None, concurrency=None,
+                     batch_size=8, cache=None):
+    """Parse every feature file matched by paths_or_globs in executor and
+    return their ParseResults in path order.
+
+    Files are sent in batches of batch_size, and at most concurrency batches
+    (the number of CPUs by default) are in flight at once. Threads only keep
+    the loop responsive; pass a concurrent.futures.ProcessPoolExecutor to
+    parse on several cores.
+    """
+    paths = expand_paths(paths_or_globs)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency or cpu_count())
+
+    async def parse(batch):
+        async with semaphore:
+            return await loop.run_in_executor(executor, parse_batch, batch,
+                                              cache)
+
+    batches = [paths[start:start + batch_size]
+               for start in range(0, len(paths), batch_size)]
+    results = []
+    for batch_results in await asyncio.gather(*[parse(batch)
+                                                for batch in batches]):
+        results.extend(batch_results)
+    return results
@@ -0,0 +1,102 @@
+"""
+Farmer's batch parsing
+
+Parse many feature files at once, spreading the work over a process pool
+"""
+import glob
+import os
+from functools import partial
+from multiprocessing import Pool, cpu_count
+from .cache import ParseCache
+from .parser import Parser
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+class ParseResult(object):
+    """Outcome of parsing one file: its features, or the error raised while
+    lexing or parsing it"""
+
+    def __init__(self, path, features=None, error=None):
+        self.path = path
+        self.features = features or []
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "<ParseResult: %s (%d features)>" % (self.path,
+                                                         len(self.features))
+        return "<ParseResult: %s (%r)>" % (self.path, self.error)
+
+
+def expand_paths(paths_or_globs):
+    """Expand files, directories and glob patterns into a list of feature
+    file paths. Input order is kept, matches of a single pattern or
+    directory are sorted, and a path is only listed once."""
+    if isinstance(paths_or_globs, string_types):
+        paths_or_globs = [paths_or_globs]
+    paths = []
+    seen = set()
+    for pattern in paths_or_globs:
+        if os.path.isdir(pattern):
+            matches = []
+            for root, dirs, files in os.walk(pattern):
+                matches.extend(os.path.join(root, name) for name in files
+                               if name.endswith(".feature"))
+        elif glob.has_magic(pattern):
+            matches = glob.glob(pattern)
+        else:
+            matches = [pattern]
+        for path in sorted(matches):
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def parse_file(path, cache=None):
+    """Lex and parse a single file, returning a ParseResult"""
+    try:
+        if cache is not None:
+            features = cache.parse_file(path)
+        else:
+            features = Parser().parse_path(path)
+    except Exception as error:
+        return ParseResult(path, error=error)
+    return ParseResult(path, features)
+
+
+def parse_paths(paths_or_globs, workers=None, cache=None):
+    """Parse every feature file matched by paths_or_globs.
+
+    Files are parsed on a pool of `workers` processes (one per cpu by
+    default, `workers=1` parses in this process). Results come back as a list
+    of ParseResult in the order of expand_paths, and a file that fails to
+    parse does not stop the others.
+
+    `cache` is a ParseCache or a cache directory; files whose content is
+    already cached are not parsed again.
+    """
+    paths = expand_paths(paths_or_globs)
+    if isinstance(cache, string_types):
+        cache = ParseCache(cache)
+    parse = partial(parse_file, cache=cache)
+    if workers is None:
+        workers = cpu_count()
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        return [parse(path) for path in paths]
+    pool = Pool(workers)
+    try:
+        chunksize = max(1, len(paths) // (workers * 4))
+        return pool.map(parse, paths, chunksize)
+    finally:
+        pool.close()
+        pool.join()
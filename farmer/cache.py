@@ -0,0 +1,154 @@
+"""
+Farmer's parse cache
+
+Parsed feature trees stored on disk, keyed by the hash of the source they
+were built from. A file whose content did not change is loaded back from the
+cache without being lexed or parsed again.
+"""
+import errno
+import hashlib
+import os
+import tempfile
+import zlib
+from . import __version__
+from .lexer import Lexer
+from .parser import Parser
+from .serialize import dumps, loads
+
+
+class ParseCache(object):
+    SUFFIX = ".farmer"
+    # part of every key; bumped when the same content would parse
+    # differently, as when the byte order mark started being skipped or
+    # lines started being stripped as bytes
+    REVISION = 3
+
+    def __init__(self, directory, max_size=64 * 1024 * 1024, lang="en"):
+        self.directory = directory
+        # total bytes of cache entries kept on disk. Once it is exceeded,
+        # the least recently used entries are removed.
+        self.max_size = max_size
+        self.lang = lang
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+
+    def __getstate__(self):
+        # workers of a pool keep their own counters
+        state = self.__dict__.copy()
+        state.update(hits=0, misses=0, _size=None)
+        return state
+
+    def key(self, content):
+        """Cache key for content, the raw bytes of a feature file"""
+        digest = hashlib.sha1()
+        digest.update(("%s:%s:%s:" % (__version__, ParseCache.REVISION,
+                                      self.lang)).encode("utf-8"))
+        digest.update(content)
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ParseCache.SUFFIX)
+
+    def get(self, key):
+        """Return the features stored under key, or None"""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as handle:
+                data = handle.read()
+        except IOError:
+            return None
+        try:
+            features = loads(zlib.decompress(data))
+        except Exception:
+            # a truncated or stale entry is just a miss
+            self.discard(path)
+            return None
+        # bump the modification time, eviction goes by least recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return features
+
+    def set(self, key, features):
+        data = zlib.compress(dumps(features))
+        # write to a temporary file first, so concurrent readers never see
+        # a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.rename(temp_path, self.path(key))
+        except Exception:
+            self.discard(temp_path)
+            raise
+        if self._size is not None:
+            self._size += len(data)
+        if self.size() > self.max_size:
+            self.evict()
+
+    def parse_file(self, path, parser=None):
+        """Return the features of the file at path, parsing it only when its
+        content is not cached yet"""
+        with open(path, "rb") as handle:
+            content = handle.read()
+        key = self.key(content)
+        features = self.get(key)
+        if features is not None:
+            self.hits += 1
+            return features
+        self.misses += 1
+        parser = parser or Parser(Lexer(self.lang))
+        # lexed as parse_path would, files strip alike with or without cache
+        features = parser.parse_bytes(content)
+        self.set(key, features)
+        return features
+
+    def entries(self):
+        """List (mtime, size, path) of every cache entry"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(ParseCache.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        if self._size is None:
+            self._size = sum(entry[1] for entry in self.entries())
+        return self._size
+
+    def evict(self, max_size=None):
+        """Remove least recently used entries until the cache fits in
+        max_size bytes"""
+        if max_size is None:
+            max_size = self.max_size
+        entries = sorted(self.entries())
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, path in entries:
+            if size <= max_size:
+                break
+            self.discard(path)
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        self.evict(0)
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
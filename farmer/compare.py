@@ -0,0 +1,247 @@
+"""
+Farmer's structural diff
+
+Compare two parsed versions of a feature and tell which scenarios, steps,
+tags and backgrounds changed, for selecting the scenarios a change has to
+rerun. Every background and scenario gets a fingerprint, a hash of its steps
+and examples; scenarios are paired through dicts keyed by name, then by
+fingerprint for the renamed ones, so the comparison stays linear in the
+number of scenarios.
+
+    changes = diff(old_feature, new_feature)
+    for scenario in changes.touched():
+        ...
+"""
+import hashlib
+from difflib import SequenceMatcher
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+RENAMED = "renamed"
+
+
+def step_signature(step):
+    """The parts of a step that make it behave differently when changed"""
+    table = tuple(step.table.to_rows()) if step.table else None
+    return (step.keyword, step.name, step.multiline, table)
+
+
+def fingerprint(container):
+    """Hex digest of the steps and examples of a background or scenario.
+    Names, tags and lines are left out, so a renamed or moved scenario
+    keeps its fingerprint."""
+    digest = hashlib.sha1()
+    for step in container.steps:
+        digest.update(repr(step_signature(step)).encode("utf-8"))
+    for examples in getattr(container, "examples", ()):
+        table = examples.table.to_rows() if examples.table else None
+        digest.update(repr(("examples", tag_names(examples), table))
+                      .encode("utf-8"))
+    return digest.hexdigest()
+
+
+def tag_names(node):
+    return tuple(sorted(tag.name for tag in node.tags))
+
+
+class StepChange(object):
+    """A step added, removed or changed; old or new is None for the first
+    two"""
+    __slots__ = ("kind", "old", "new")
+
+    def __init__(self, kind, old=None, new=None):
+        self.kind = kind
+        self.old = old
+        self.new = new
+
+    def __repr__(self):
+        step = self.new if self.old is None else self.old
+        return "<StepChange: %s %s>" % (self.kind, step.name)
+
+
+def diff_steps(old_steps, new_steps):
+    """List the StepChanges turning old_steps into new_steps"""
+    matcher = SequenceMatcher(None, [step_signature(step)
+                                     for step in old_steps],
+                              [step_signature(step) for step in new_steps],
+                              autojunk=False)
+    changes = []
+    for operation, old_start, old_end, new_start, new_end\
+            in matcher.get_opcodes():
+        if operation == "equal":
+            continue
+        old = old_steps[old_start:old_end]
+        new = new_steps[new_start:new_end]
+        paired = min(len(old), len(new))
+        changes.extend(StepChange(CHANGED, old[index], new[index])
+                       for index in range(paired))
+        changes.extend(StepChange(REMOVED, step) for step in old[paired:])
+        changes.extend(StepChange(ADDED, new=step) for step in new[paired:])
+    return changes
+
+
+class ElementChange(object):
+    """A background or scenario added, removed, renamed or changed.
+
+    steps lists the StepChanges, tags_added and tags_removed the tag names,
+    and examples_changed tells whether the examples of an outline differ.
+    A renamed scenario may have changed tags as well.
+    """
+
+    def __init__(self, kind, old=None, new=None):
+        self.kind = kind
+        self.old = old
+        self.new = new
+        self.steps = []
+        self.tags_added = ()
+        self.tags_removed = ()
+        self.examples_changed = False
+
+    @property
+    def name(self):
+        return (self.new if self.new is not None else self.old).name
+
+    def __repr__(self):
+        return "<ElementChange: %s %s>" % (self.kind, self.name)
+
+    @classmethod
+    def compare(cls, old, new, kind=CHANGED):
+        """The change between two versions of an element, None when they
+        are the same"""
+        old_fingerprint, new_fingerprint = fingerprint(old), fingerprint(new)
+        old_tags, new_tags = set(tag_names(old)), set(tag_names(new))
+        if kind == CHANGED and old_fingerprint == new_fingerprint and\
+           old_tags == new_tags:
+            return None
+        change = cls(kind, old, new)
+        change.tags_added = tuple(sorted(new_tags - old_tags))
+        change.tags_removed = tuple(sorted(old_tags - new_tags))
+        if old_fingerprint != new_fingerprint:
+            change.steps = diff_steps(old.steps, new.steps)
+            old_examples = getattr(old, "examples", ())
+            new_examples = getattr(new, "examples", ())
+            change.examples_changed = [
+                (tag_names(examples), examples.table)
+                for examples in old_examples] != [
+                (tag_names(examples), examples.table)
+                for examples in new_examples]
+        return change
+
+
+class FeatureDiff(object):
+    """The changes between two versions of a feature. scenarios lists the
+    ElementChanges of the scenarios in the order of the new feature, the
+    removed ones last."""
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.name_changed = False
+        self.tags_added = ()
+        self.tags_removed = ()
+        self.background = None
+        self.scenarios = []
+
+    def __bool__(self):
+        return bool(self.name_changed or self.tags_added or
+                    self.tags_removed or self.background or self.scenarios)
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return "<FeatureDiff: %d scenarios changed>" % len(self.scenarios)
+
+    def of_kind(self, kind):
+        return [change for change in self.scenarios if change.kind == kind]
+
+    @property
+    def added(self):
+        return self.of_kind(ADDED)
+
+    @property
+    def removed(self):
+        return self.of_kind(REMOVED)
+
+    @property
+    def changed(self):
+        return self.of_kind(CHANGED)
+
+    @property
+    def renamed(self):
+        return self.of_kind(RENAMED)
+
+    def touched(self):
+        """The scenarios of the new feature to rerun: all of them when the
+        background or the feature tags changed, else the added, renamed
+        and changed ones"""
+        if self.new is None:
+            return []
+        if self.background or self.tags_added or self.tags_removed:
+            return list(self.new.scenario_list)
+        return [change.new for change in self.scenarios
+                if change.new is not None]
+
+
+def pair_by(key, old_scenarios, new_scenarios):
+    """Pair the scenarios of the two lists having the same key, in order
+    for keys shared by several scenarios. Returns the pairs and what is
+    left of both lists."""
+    olds = {}
+    for scenario in old_scenarios:
+        olds.setdefault(key(scenario), []).append(scenario)
+    for candidates in olds.values():
+        candidates.reverse()
+    pairs = []
+    unpaired = []
+    for scenario in new_scenarios:
+        candidates = olds.get(key(scenario))
+        if candidates:
+            pairs.append((candidates.pop(), scenario))
+        else:
+            unpaired.append(scenario)
+    paired = set(id(old) for old, new in pairs)
+    return (pairs, [scenario for scenario in old_scenarios
+                    if id(scenario) not in paired], unpaired)
+
+
+def diff(old, new):
+    """Compare two versions of a feature, either of which may be None for
+    a feature that was added or removed, and return a FeatureDiff"""
+    result = FeatureDiff(old, new)
+    old_scenarios = list(old.scenario_list) if old is not None else []
+    new_scenarios = list(new.scenario_list) if new is not None else []
+    if old is not None and new is not None:
+        result.name_changed = old.name != new.name
+        old_tags, new_tags = set(tag_names(old)), set(tag_names(new))
+        result.tags_added = tuple(sorted(new_tags - old_tags))
+        result.tags_removed = tuple(sorted(old_tags - new_tags))
+    old_background = old.background if old is not None else None
+    new_background = new.background if new is not None else None
+    if old_background is None and new_background is not None:
+        result.background = ElementChange(ADDED, new=new_background)
+    elif old_background is not None and new_background is None:
+        result.background = ElementChange(REMOVED, old_background)
+    elif old_background is not None:
+        result.background = ElementChange.compare(old_background,
+                                                  new_background)
+
+    by_name, old_left, new_left = pair_by(
+        lambda scenario: scenario.name, old_scenarios, new_scenarios)
+    by_fingerprint, old_left, new_left = pair_by(
+        lambda scenario: (scenario.key_type, fingerprint(scenario)),
+        old_left, new_left)
+    changes = {}
+    for old_scenario, new_scenario in by_name:
+        change = ElementChange.compare(old_scenario, new_scenario)
+        if change is not None:
+            changes[id(new_scenario)] = change
+    for old_scenario, new_scenario in by_fingerprint:
+        changes[id(new_scenario)] = ElementChange.compare(
+            old_scenario, new_scenario, RENAMED)
+    for scenario in new_left:
+        changes[id(scenario)] = ElementChange(ADDED, new=scenario)
+    result.scenarios = [changes[id(scenario)] for scenario in new_scenarios
+                        if id(scenario) in changes]
+    result.scenarios.extend(ElementChange(REMOVED, scenario)
+                            for scenario in old_left)
+    return result
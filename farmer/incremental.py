@@ -0,0 +1,192 @@
+"""
+Farmer's incremental documents
+
+Keep the parsed feature of a document in sync while it is being edited.
+Only the scenarios around an edit are lexed and built again, and they are
+patched into the existing tree.
+"""
+from bisect import bisect_right
+from .lexer import Lexer
+from .node import EMPTY, Feature
+from .parser import Parser
+
+
+def signature(element):
+    """Everything about a background or scenario except its position"""
+    return (element.key_type, element.keyword, element.name,
+            tuple(tag.name for tag in element.tags),
+            tuple((step.keyword, step.name, step.multiline, step.table)
+                  for step in element.steps),
+            tuple((examples.name, tuple(tag.name for tag in examples.tags),
+                   examples.table)
+                  for examples in getattr(element, "examples", ())))
+
+
+def shift(element, delta):
+    element.line += delta
+    for tag in element.tags:
+        tag.line += delta
+    for step in element.steps:
+        step.line += delta
+    for examples in getattr(element, "examples", ()):
+        examples.line += delta
+        for tag in examples.tags:
+            tag.line += delta
+
+
+def tag_names(element):
+    return [tag.name for tag in element.tags]
+
+
+class DocumentEdit(object):
+    """Backgrounds and scenarios touched by an edit. `added` and `changed`
+    hold nodes of the new tree, `removed` nodes of the old one."""
+
+    def __init__(self, added, changed, removed, reparsed=False):
+        self.added = added
+        self.changed = changed
+        self.removed = removed
+        # whether the whole document had to be parsed again
+        self.reparsed = reparsed
+
+    def __repr__(self):
+        return "<DocumentEdit: +%d ~%d -%d>" % (
+            len(self.added), len(self.changed), len(self.removed))
+
+    @classmethod
+    def compare(cls, old, new, reparsed=False):
+        """Match old and new elements by name and sort them into added,
+        changed and removed"""
+        by_name = {}
+        for element in old:
+            by_name.setdefault(element.name, []).append(element)
+        added = []
+        changed = []
+        for element in new:
+            candidates = by_name.get(element.name)
+            if not candidates:
+                added.append(element)
+            elif signature(candidates.pop(0)) != signature(element):
+                changed.append(element)
+        removed = [element for elements in by_name.values()
+                   for element in elements]
+        removed.sort(key=lambda element: element.line)
+        return cls(added, changed, removed, reparsed)
+
+
+class IncrementalDocument(object):
+    """A document given as a list of lines, and its parsed features"""
+
+    def __init__(self, lines=(), lexer=None):
+        self.lexer = lexer or Lexer()
+        self.parser = Parser(self.lexer)
+        self.lines = [line.rstrip("\r\n") for line in lines]
+        self.features = []
+        self.reparse()
+
+    @property
+    def feature(self):
+        return self.features[0] if self.features else None
+
+    def elements(self):
+        """Backgrounds and scenarios of every feature"""
+        elements = []
+        for feature in self.features:
+            if feature.background is not None:
+                elements.append(feature.background)
+            elements.extend(feature.scenario_list)
+        return elements
+
+    def reparse(self):
+        """Parse the whole document again"""
+        old = self.elements()
+        self.features = self.parser.parse(self.lines)
+        return DocumentEdit.compare(old, self.elements(), reparsed=True)
+
+    def apply_edit(self, start_line, end_line, new_lines):
+        """Replace lines [start_line, end_line) with new_lines.
+
+        A document is cut into regions running from the header line of a
+        background or scenario to the header line of the next one. Regions
+        touched by the edit are lexed and built again and replace their old
+        nodes in the tree, while later nodes only get their line indexes
+        shifted. Tags at the end of a region belong to the next header.
+        Edits to the feature header fall back to a full parse. Returns a
+        DocumentEdit.
+        """
+        if not 0 <= start_line <= end_line <= len(self.lines):
+            raise IndexError("Edit %d:%d is out of the document" % (
+                start_line, end_line))
+        new_lines = [line.rstrip("\r\n") for line in new_lines]
+        feature = self.feature
+        blocks = []
+        if len(self.features) == 1:
+            blocks = feature.scenario_list[:]
+            if feature.background is not None:
+                blocks.append(feature.background)
+            blocks.sort(key=lambda block: block.line)
+        headers = [block.line for block in blocks]
+        if not blocks or start_line <= headers[0]:
+            self.lines[start_line:end_line] = new_lines
+            return self.reparse()
+
+        # regions holding the line before the edit through the last edited
+        # line
+        first = bisect_right(headers, start_line - 1) - 1
+        last = max(first, bisect_right(headers, end_line - 1) - 1)
+        region_start = headers[first]
+        if last + 1 < len(blocks):
+            region_end = headers[last + 1]
+        else:
+            region_end = len(self.lines)
+        delta = len(new_lines) - (end_line - start_line)
+        self.lines[start_line:end_line] = new_lines
+
+        lexer = Lexer(self.lexer.lang)
+        elements = lexer.iter_elements(
+            self.lines[region_start:region_end + delta], region_start)
+        new_feature, description, background, scenario_list, dangling =\
+            Feature.build_parts(elements)
+        old_blocks = blocks[first:last + 1]
+        has_background = feature.background in old_blocks
+        if new_feature is not None or description is not None\
+           or lexer.should_be_multiline\
+           or (background is not None) != has_background:
+            # the edit changed the structure of the feature itself, or added
+            # or removed a background
+            return self.reparse()
+
+        # the header the region starts with was not edited, and its tags
+        # sit before the region
+        for block in scenario_list[:1] + [background]:
+            if block is not None and block.line == region_start:
+                block.tags = old_blocks[0].tags
+        old_scenarios = [block for block in old_blocks
+                         if block is not feature.background]
+        index = len([block for block in feature.scenario_list
+                     if block.line < region_start])
+        feature.scenario_list[index:index + len(old_scenarios)] = scenario_list
+        for scenario in scenario_list:
+            scenario.feature = feature
+        if has_background:
+            feature.background = background
+            # the effective steps of every scenario start with the old
+            # background steps
+            feature.flatten()
+        for block in blocks[last + 1:]:
+            shift(block, delta)
+
+        new_blocks = scenario_list[:]
+        if background is not None:
+            new_blocks.insert(0, background)
+        edit = DocumentEdit.compare(old_blocks, new_blocks)
+        if last + 1 < len(blocks):
+            # the tags of the next block were lexed with this region
+            following = blocks[last + 1]
+            old_tags = tag_names(following)
+            following.tags = dangling or EMPTY
+            if following is not feature.background:
+                following._effective_tags = None
+            if tag_names(following) != old_tags:
+                edit.changed.append(following)
+        return edit
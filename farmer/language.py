@@ -1,16 +1,71 @@
-LANGUAGE = {
-    "en": {
-        "name": "English",
-        "native": "English",
-        "feature": "Feature",
-        "background": "Background",
-        "scenario": "Scenario",
-        "scenario_outline": "Scenario Outline|Scenario Template",
-        "examples": "Examples|Scenario",
-        "given": "Given",
-        "when": "When",
-        "then": "Then",
-        "and": "And",
-        "but": "But"
-    }
-}
+"""
+Farmer's languages
+
+Keywords of every Gherkin language, taken from the gherkin-languages.json
+of the Cucumber project (see i18n/LICENSE). Each language lives in its own
+JSON file under farmer/i18n and is only read the first time it is used, so
+importing farmer does not load any of them.
+
+A language maps every keyword type to the list of its spellings. Step
+keywords ending with a space must be followed by whitespace, the others
+(as in Japanese or `Lorsqu'`) run straight into the step text.
+"""
+import io
+import json
+import os
+import re
+
+
+class Languages(object):
+    """Read only mapping of language codes to their keywords, loading each
+    language from its data file on first access"""
+    CODE_PATTERN = re.compile(r"^[a-zA-Z\-]+$")
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._loaded = {}
+
+    def __getitem__(self, lang):
+        try:
+            return self._loaded[lang]
+        except KeyError:
+            pass
+        # codes become file names, anything else is not a language
+        if not Languages.CODE_PATTERN.match(lang):
+            raise KeyError(lang)
+        try:
+            with io.open(os.path.join(self.directory, lang + ".json"),
+                         encoding="utf-8") as handle:
+                keywords = json.load(handle)
+        except IOError:
+            raise KeyError(lang)
+        self._loaded[lang] = keywords
+        return keywords
+
+    def __contains__(self, lang):
+        try:
+            self[lang]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.codes())
+
+    def __len__(self):
+        return len(self.codes())
+
+    def get(self, lang, default=None):
+        try:
+            return self[lang]
+        except KeyError:
+            return default
+
+    def codes(self):
+        """Sorted codes of the available languages"""
+        return sorted(name[:-5] for name in os.listdir(self.directory)
+                      if name.endswith(".json"))
+
+
+LANGUAGE = Languages(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "i18n"))
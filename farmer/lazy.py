@@ -0,0 +1,207 @@
+"""
+Farmer's lazy parsing
+
+Index a feature file by its headers only: the feature, its tags and
+description, and the name, tags and line range of every background and
+scenario. The steps of a scenario are lexed and built the first time its
+`steps` are read.
+"""
+from .lexer import Lexer
+from .node import (Background, Feature, Scenario, ScenarioOutline,
+                   Tag)
+
+
+class LazySteps(object):
+    """Mixin for steps containers that hold on to their source lines until
+    their steps are needed"""
+    __slots__ = ()
+
+    def __init__(self, keyword, name, key_type, tags=None, line=None,
+                 end_line=None, body=None):
+        super(LazySteps, self).__init__(keyword, name, key_type, tags=tags,
+                                        line=line)
+        # lines [line, end_line) of the source belong to this element
+        self.end_line = end_line
+        # (source lines, language) shared by the elements of a document
+        self._body = body
+
+    @property
+    def steps(self):
+        if self._body is not None:
+            self.load()
+        return self._steps
+
+    @steps.setter
+    def steps(self, steps):
+        self._body = None
+        self._steps = steps
+
+    @property
+    def loaded(self):
+        return self._body is None
+
+    @property
+    def line_range(self):
+        return (self.line, self.end_line)
+
+    def load(self):
+        """Lex and build the body of the element"""
+        lines, lang = self._body
+        # the slice starts at the header line, so comments leading the body
+        # are never taken for a `# language:` header
+        elements = Lexer(lang).iter_elements(lines[self.line:self.end_line],
+                                             self.line)
+        feature, description, background, scenario_list, dangling =\
+            Feature.build_parts(elements)
+        self.loaded_from(background or scenario_list[0])
+
+    def loaded_from(self, element):
+        self.steps = element.steps
+
+
+class LazyScenario(LazySteps, Scenario):
+    __slots__ = ("end_line", "_body", "_steps")
+
+
+class LazyScenarioOutline(LazySteps, ScenarioOutline):
+    __slots__ = ("end_line", "_body", "_steps", "_examples")
+
+    @property
+    def examples(self):
+        if self._body is not None:
+            self.load()
+        return self._examples
+
+    @examples.setter
+    def examples(self, examples):
+        self._examples = examples
+
+    def loaded_from(self, element):
+        self.steps = element.steps
+        self.examples = element.examples
+
+
+class LazyBackground(LazySteps, Background):
+    __slots__ = ("end_line", "_body", "_steps")
+
+
+LAZY_CONTAINERS = {
+    "background": LazyBackground,
+    "scenario": LazyScenario,
+    "scenario_outline": LazyScenarioOutline,
+}
+
+
+def after_step(lines, lexer):
+    """Whether any of lines, free text or steps, is a step"""
+    match_keyword = lexer.matcher.match_keyword
+    for line in reversed(lines):
+        match = match_keyword(line)
+        if match and match[0] == "step":
+            return True
+    return False
+
+
+def index_elements(lines, lexer):
+    """Yield the header elements (keyword, name, key_type, line) of lines,
+    skipping steps, tables and multiline blocks. The feature description
+    comes out as a single element right after its feature."""
+    in_multiline = False
+    description = None
+    # as in the lexer, the description ends at the first step or row
+    describing = False
+    # lines since the last header, tag or row: steps or free text. As in
+    # the lexer, a multiline block only opens when the last of them that
+    # is not free text is a step; they are only matched when that matters.
+    unmatched = []
+    for index, line in lexer.content_lines(lines):
+        if in_multiline:
+            in_multiline = line != '"""'
+            continue
+        first = line[0]
+        if first == "|":
+            del unmatched[:]
+            describing = False
+            continue
+        if first == '"' and line == '"""' and after_step(unmatched, lexer):
+            in_multiline = True
+            del unmatched[:]
+            continue
+        if first == "@":
+            match = None
+        else:
+            match = lexer.matcher.match_element(line)
+            if not match:
+                if describing:
+                    if lexer.matcher.match_keyword(line):
+                        describing = False
+                    else:
+                        description.append(line)
+                unmatched.append(line)
+                continue
+        del unmatched[:]
+        if description:
+            yield ("Feature Description", "\n".join(description),
+                   "feature_description", -1)
+        description = None
+        describing = False
+        if match:
+            key_type, name, keyword = match
+            yield (keyword, name, key_type, index)
+            if key_type == "feature":
+                description = []
+                describing = True
+        else:
+            for tag in Lexer.TAG_PATTERN.findall(line):
+                yield ("Tag", tag, "tag", index)
+    if description:
+        yield ("Feature Description", "\n".join(description),
+               "feature_description", -1)
+
+
+def index_features(source, lexer=None):
+    """Parse the headers of source into features whose backgrounds and
+    scenarios load their steps on demand"""
+    lexer = lexer or Lexer()
+    lines = list(source)
+    elements = list(index_elements(lines, lexer))
+    body = (lines, lexer.lang)
+    # each feature, background or scenario runs up to the next one, or the
+    # tags of the next one
+    ends = {}
+    next_start = len(lines)
+    tags_start_block = False
+    for keyword, name, key_type, line in reversed(elements):
+        if key_type == "tag":
+            if tags_start_block:
+                next_start = line
+        elif key_type in LAZY_CONTAINERS or key_type == "feature":
+            ends[line] = next_start
+            next_start = line
+            tags_start_block = True
+        else:
+            tags_start_block = False
+    features = []
+    feature = None
+    tags = []
+    for keyword, name, key_type, line in elements:
+        if key_type == "tag":
+            tags.append(Tag(keyword, name, key_type, line))
+            continue
+        if key_type == "feature":
+            feature = Feature(keyword, name, key_type, tags, line)
+            features.append(feature)
+        elif key_type == "feature_description":
+            if feature is not None:
+                feature.description = name
+        elif key_type in LAZY_CONTAINERS and feature is not None:
+            container = LAZY_CONTAINERS[key_type](
+                keyword, name, key_type, tags=tags, line=line,
+                end_line=ends[line], body=body)
+            if key_type == "background":
+                feature.background = container
+            else:
+                container.feature = feature
+                feature.scenario_list.append(container)
+        tags = []
+    return features
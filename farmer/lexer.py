@@ -3,47 +3,370 @@ Farmer's Lexer
 
 This is the lexer to parse a Gherkin input into tokens
 """
+import codecs
+import io
+import mmap
 import re
 from .language import LANGUAGE
+from .stats import instrument_lexer
+
+
+class KeywordMatcher(object):
+    """Precompiled keyword table for a single language.
+
+    Every feature element keyword and every step keyword of the language is
+    folded into one alternation, so classifying a line costs a single regex
+    call. Matchers are built once per language, the first time the language
+    is used, and cached on the class.
+    """
+    ELEMENT_KEYS = ["feature", "background", "scenario", "scenario_outline",
+                    "examples"]
+    STEP_KEYS = ["given", "when", "then", "and", "but"]
+    _cache = {}
+
+    def __init__(self, keywords):
+        alternatives = [r"(?:%s):\s*(?P<%s>.*)" % (
+            KeywordMatcher.alternation(keywords[key]), key)
+            for key in KeywordMatcher.ELEMENT_KEYS]
+        # feature elements only, for scans that skip over steps
+        self.element_pattern = re.compile("^(?:%s)" % "|".join(alternatives))
+        step_keywords = set()
+        for key in KeywordMatcher.STEP_KEYS:
+            step_keywords.update(keywords[key])
+        alternatives.append(r"(?:%s)\s*(?P<step>.*)" %
+                            KeywordMatcher.alternation(step_keywords))
+        self.pattern = re.compile("^(?:%s)" % "|".join(alternatives))
+
+    @staticmethod
+    def alternation(keywords):
+        """Regex alternation of keywords, longest first so a keyword never
+        shadows a longer one it is a prefix of. A trailing space in a
+        keyword requires whitespace, or the end of the line, after it."""
+        parts = []
+        for keyword in sorted(set(keywords), key=lambda k: (-len(k), k)):
+            if keyword.endswith(" "):
+                parts.append(re.escape(keyword.rstrip()) + r"(?!\S)")
+            else:
+                parts.append(re.escape(keyword))
+        return "|".join(parts)
+
+    @classmethod
+    def for_language(cls, lang):
+        try:
+            return cls._cache[lang]
+        except KeyError:
+            pass
+        try:
+            keywords = LANGUAGE[lang]
+        except KeyError:
+            raise KeyError("Language: %s is not defined" % lang)
+        matcher = cls._cache[lang] = cls(keywords)
+        return matcher
+
+    def match(self, line):
+        """Return (token_type, value) for a keyword line, or None"""
+        match = self.pattern.match(line)
+        if match:
+            return match.lastgroup, match.group(match.lastindex)
+        return None
+
+    def match_keyword(self, line):
+        """Return (token_type, value, keyword) for a keyword line, or None"""
+        return self._keyword_groups(self.pattern.match(line), line)
+
+    def match_element(self, line):
+        """Like match_keyword, but only for feature element keywords"""
+        return self._keyword_groups(self.element_pattern.match(line), line)
+
+    def _keyword_groups(self, match, line):
+        if match:
+            keyword = line[:match.start(match.lastindex)].rstrip()
+            if match.lastgroup != "step":
+                keyword = keyword[:-1].rstrip()
+            return match.lastgroup, match.group(match.lastindex), keyword
+        return None
 
 
 class Lexer(object):
-    LANGUAGE_PATTERN = re.compile("^\s*#\s*language\s*:\s*([a-zA-Z\-]+)")
+    LANGUAGE_PATTERN = re.compile(r"^\s*#\s*language\s*:\s*([a-zA-Z\-]+)")
     COMMENT = "#"
+    COMMENT_BYTE = b"#"
+    TAG_PATTERN = re.compile(r"@(\w+)")
     FEATURE_ELEMENTS_KEYS = ["feature", "background", "scenario",
                              "scenario_outline", "example"]
-    STEP_KEYS = ["given", "when", "then", "and", "but"]
+    STEP_KEYS = KeywordMatcher.STEP_KEYS
     KEYWORDS = FEATURE_ELEMENTS_KEYS + STEP_KEYS
+    # keyword of the parser elements built from tokens that are not matched
+    # by a language keyword
+    ELEMENT_KEYWORDS = {
+        "tag": "Tag",
+        "feature_description": "Feature Description",
+        "row": "|",
+        "multiline": '"""',
+    }
 
-    def __init__(self):
-        self.lang = "en"
+    def __init__(self, lang="en", stats=None):
+        self.default_lang = lang
+        self.lang = lang
+        # lines are dispatched on their first character before falling back
+        # to the keyword matcher of the current language
+        self.prefix_tokens = {
+            "@": self.tag_token,
+            "|": self.table_row_token,
+        }
+        # unfinished last line of the chunks given to feed, None when no
+        # source is being fed
+        self.pending = None
+        # a farmer.stats.Stats object counting lines and tokens, see
+        # instrument_lexer
+        self.stats = None
+        if stats is not None:
+            instrument_lexer(self, stats)
 
     def tokenize(self, source):
-        self.source = [(index, line.strip())
-                       for index, line in enumerate(source) if line.strip()]
-        self.get_meta()
-        self.remove_comments()
+        self.source = list(self.content_lines(source))
+        return self.scan(self)
+
+    def tokenize_file(self, path, encoding="utf-8"):
+        """Like tokenize, reading the file at path through a memory map"""
+        self.source = list(self.mapped_lines(path, encoding))
+        return self.scan(self)
+
+    def iter_tokens(self, source, first_index=0):
+        """Lazily lex source, yielding tokens as soon as they are final.
+
+        Lines are pulled from source one at a time, so a file handle is never
+        read into memory as a whole. Line indexes are counted from
+        first_index, for sources that are a slice of a larger document.
+        """
+        return self.scan_tokens(self.content_lines(source, first_index))
+
+    def iter_elements(self, source, first_index=0):
+        """Lazily lex source into parser elements (keyword, name, key_type,
+        line_index), the structure consumed by Parser.parse_lex"""
+        return self.scan_elements(self.content_lines(source, first_index))
+
+    def iter_file_elements(self, path, encoding="utf-8"):
+        """Like iter_elements, reading the file at path through a memory
+        map"""
+        return self.scan_elements(self.mapped_lines(path, encoding))
+
+    def iter_bytes_elements(self, content, encoding="utf-8"):
+        """Like iter_file_elements, for the raw bytes of a file"""
+        return self.scan_elements(self.buffer_lines(io.BytesIO(content),
+                                                    encoding))
+
+    def scan_tokens(self, lines):
+        """Yield the tokens of (index, stripped_line) pairs"""
+        self.start_scan()
+        tokens = self.tokens
+        for index, line in lines:
+            self.scan_line(index, line)
+            if tokens:
+                for token in tokens:
+                    yield token
+                del tokens[:]
+        self.finish_scan()
+        for token in tokens:
+            yield token
+        del tokens[:]
+
+    def scan_elements(self, lines):
+        """Yield the parser elements of (index, stripped_line) pairs"""
+        self.start_scan()
+        tokens = self.tokens
+        for index, line in lines:
+            self.keyword = None
+            self.scan_line(index, line)
+            if tokens:
+                for token in tokens:
+                    yield self.element(token)
+                del tokens[:]
+        self.finish_scan()
+        for token in tokens:
+            yield self.element(token)
+        del tokens[:]
+
+    def start_feed(self, elements=False, encoding="utf-8"):
+        """Start lexing a source pushed piecemeal, one raw line at a time
+        through feed_line or in chunks through feed. feed and close return
+        parser elements instead of tokens when elements is true."""
+        self.use_language(self.default_lang)
+        self.start_scan()
+        self.in_header = True
+        # index of the next line fed
+        self.feed_index = 0
+        self.pending = u""
+        self.feed_elements = elements
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+
+    def feed(self, chunk):
+        """Lex the next chunk of the source and return the tokens it
+        finished. Chunks are bytes, decoded with the encoding given to
+        start_feed, or text, and may end anywhere, even inside a line or a
+        multibyte character. A source is started implicitly by the first
+        feed, and ended by close."""
+        if self.pending is None:
+            self.start_feed()
+        if not isinstance(chunk, type(u"")):
+            chunk = self.decoder.decode(chunk)
+        if u"\n" not in chunk:
+            self.pending += chunk
+            return []
+        lines = (self.pending + chunk).split(u"\n")
+        self.pending = lines.pop()
+        finished = []
+        for line in lines:
+            self.feed_line(line)
+            if self.tokens:
+                finished.extend(self.pop_elements() if self.feed_elements
+                                else self.pop_tokens())
+        return finished
+
+    def close(self):
+        """End the source given to feed, returning the last tokens"""
+        if self.pending is None:
+            self.start_feed()
+        last_line = self.pending + self.decoder.decode(b"", True)
+        if last_line:
+            self.feed_line(last_line)
+        self.end_feed()
+        self.pending = None
+        if self.feed_elements:
+            return self.pop_elements()
+        return self.pop_tokens()
+
+    def feed_line(self, line):
+        """Lex the next raw line of the source. Finished tokens are left in
+        self.tokens; pop_tokens or pop_elements take them out."""
+        index = self.feed_index
+        self.feed_index += 1
+        line = line.strip()
+        if not line:
+            return
+        if line[0] == Lexer.COMMENT:
+            if self.in_header:
+                language_matcher = Lexer.LANGUAGE_PATTERN.match(line)
+                if language_matcher:
+                    self.use_language(language_matcher.group(1))
+            return
+        self.in_header = False
+        self.keyword = None
+        self.scan_line(index, line)
+
+    def end_feed(self):
+        """Flush the tokens still pending at the end of the source"""
+        self.finish_scan()
+
+    def pop_tokens(self):
+        tokens = self.tokens[:]
+        del self.tokens[:]
+        return tokens
+
+    def pop_elements(self):
+        """Like pop_tokens, converting the tokens into parser elements"""
+        elements = [self.element(token) for token in self.tokens]
+        del self.tokens[:]
+        return elements
+
+    def element(self, token):
+        key_type, value, index = token
+        if self.keyword is not None and index == self.index\
+           and key_type not in Lexer.ELEMENT_KEYWORDS:
+            return (self.keyword, value, key_type, index)
+        return (Lexer.ELEMENT_KEYWORDS.get(key_type, key_type), value, key_type,
+                index)
+
+    def content_lines(self, source, first_index=0):
+        """Yield the (index, stripped_line) pairs of source worth scanning.
+
+        Blank lines and comments are dropped. A `# language:` header is only
+        looked for in the comments leading the source; the keywords of that
+        language are selected when the first content line shows up.
+        """
+        self.use_language(self.default_lang)
+        in_header = True
+        for index, line in enumerate(source, first_index):
+            line = line.strip()
+            if not line:
+                continue
+            if line[0] == Lexer.COMMENT:
+                if in_header:
+                    language_matcher = Lexer.LANGUAGE_PATTERN.match(line)
+                    if language_matcher:
+                        self.use_language(language_matcher.group(1))
+                continue
+            in_header = False
+            yield index, line
+
+    def mapped_lines(self, path, encoding="utf-8"):
+        """Yield the (index, stripped_line) pairs of the file at path, like
+        content_lines does for a text source.
+
+        The file is memory mapped and its lines are read by buffer_lines.
+        """
+        self.use_language(self.default_lang)
+        with open(path, "rb") as handle:
+            try:
+                data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # an empty file can not be mapped
+                return
         try:
-            self.keywords = LANGUAGE[self.lang]
-            return self.scan(self)
-        except KeyError:
-            raise KeyError("Language: %s is not defined" % self.lang)
+            for pair in self.buffer_lines(data, encoding):
+                yield pair
+        finally:
+            data.close()
 
-    def get_meta(self):
-        for line in self.source:
-            language_matcher = Lexer.LANGUAGE_PATTERN.match(line[1])
-            if language_matcher:
-                self.lang = language_matcher.groups()[0]
+    def buffer_lines(self, data, encoding="utf-8"):
+        """Yield the (index, stripped_line) pairs of data, a binary buffer
+        with readline such as a memory map or io.BytesIO.
 
-    def remove_comments(self):
-        self.source = [item for item in self.source
-                       if not item[1].startswith("#")]
+        Lines are stripped and checked as raw bytes: blank lines and
+        comments are skipped without being decoded, except for the comments
+        leading the buffer, which may hold a `# language:` header.
+        """
+        self.use_language(self.default_lang)
+        if data.read(3) != b"\xef\xbb\xbf":
+            data.seek(0)
+        comment = Lexer.COMMENT_BYTE
+        in_header = True
+        for index, line in enumerate(iter(data.readline, b"")):
+            line = line.strip()
+            if not line:
+                continue
+            if line[:1] == comment:
+                if in_header:
+                    language_matcher = Lexer.LANGUAGE_PATTERN.match(
+                        line.decode(encoding))
+                    if language_matcher:
+                        self.use_language(language_matcher.group(1))
+                continue
+            in_header = False
+            yield index, line.decode(encoding)
+
+    def use_language(self, lang):
+        self.matcher = KeywordMatcher.for_language(lang)
+        self.keywords = LANGUAGE[lang]
+        self.lang = lang
 
     def scan(self, source):
+        self.start_scan()
+        # Read lines of the feature, one by one
+        for index, line in self.source:
+            self.scan_line(index, line)
+        self.finish_scan()
+        return self.tokens
+
+    def start_scan(self):
         # current line that we are parsing
         self.line = ""
         # collection of all parsed tokens in the form of (:TOKEN_TYPE, value)
         self.tokens = []
+        # type of the last emitted token
+        self.last_type = None
+        # keyword text of the last keyword line
+        self.keyword = None
         # current feature description.
         self.current_feature_desc = []
         # current multiline. When this is true, all the following lines will be
@@ -52,46 +375,49 @@ class Lexer(object):
         self.multiline_start = -1
         self.current_multiline = []
 
-        # Read lines of the feature, one by one
-        for index, line in self.source:
-            self.index = index
-            self.line = line.strip()
-            if self.line:
-                token = self.feature_token()\
-                        or self.background_token()\
-                        or self.scenario_token()\
-                        or self.scenario_outline_token()\
-                        or self.examples_token()\
-                        or self.tag_token()\
-                        or self.step_token()\
-                        or self.feature_description_token()\
-                        or self.multiline_token()\
-                        or self.table_row_token()\
-
-                # unless we get a new token, and the token is proper children
-                # of the feature, and current feature description is not empty
-                if token and len(self.current_feature_desc) > 0\
-                   and token[0] in Lexer.FEATURE_ELEMENTS_KEYS:
-                    self.add_feature_description()
-
-                if token and token != Lexer.COMMENT:
-                    # either extend the tokens if new token is a list, or
-                    # append it
-                    if type(token) is list:
-                        self.tokens.extend(token)
-                    else:
-                        self.tokens.append(token)
+    def scan_line(self, index, line):
+        """Scan a single stripped, non-empty line, appending any finished
+        tokens to self.tokens"""
+        self.index = index
+        self.line = line
+        if self.should_be_multiline:
+            self.multiline_token()
+            return
+        prefix_token = self.prefix_tokens.get(line[0])
+        if prefix_token:
+            token = prefix_token()
+        else:
+            token = self.keyword_token()\
+                    or self.feature_description_token()\
+                    or self.multiline_token()
+
+        # unless we get a new token, and the token is proper children
+        # of the feature, and current feature description is not empty
+        if token and len(self.current_feature_desc) > 0\
+           and token[0] in Lexer.FEATURE_ELEMENTS_KEYS:
+            self.add_feature_description()
+
+        if token:
+            # either extend the tokens if new token is a list, or
+            # append it
+            if type(token) is list:
+                self.tokens.extend(token)
+                self.last_type = "tag"
+            else:
+                self.tokens.append(token)
+                self.last_type = token[0]
 
+    def finish_scan(self):
         # end of file, if there is still non-empty current feature description,
         # insert it into the token list
         if len(self.current_feature_desc) > 0:
             self.add_feature_description()
-        return self.tokens
 
     def add_feature_description(self):
         # set the feature description.
         self.tokens.append(("feature_description",
                            "\n".join(self.current_feature_desc), -1))
+        self.last_type = "feature_description"
         # reset the description to prepare for new feature
         self.current_feature_desc = []
 
@@ -110,63 +436,29 @@ class Lexer(object):
                 "multiline"))
         self.current_multiline = []
 
-    def match_feature_keys(self, keyword, token_type):
-        """Match Lexer.FEATURE_KEYS tokens"""
-        if not self.should_be_multiline:
-            match = re.match("^\s*(%s):\s*(.*)" % keyword, self.line)
-            if match:
-                groups = match.groups()
-                return (token_type, groups[-1], self.index)
+    def keyword_token(self):
+        """Match feature element and step keywords of the current language"""
+        match = self.matcher.match_keyword(self.line)
+        if match:
+            self.keyword = match[2]
+            return (match[0], match[1], self.index)
         return None
 
-    def feature_token(self):
-        return self.match_feature_keys(self.keywords["feature"], "feature")
-
-    def background_token(self):
-        return self.match_feature_keys(self.keywords["background"],
-                                       "background")
-
-    def scenario_token(self):
-        return self.match_feature_keys(self.keywords["scenario"],
-                                       "scenario")
-
-    def scenario_outline_token(self):
-        return self.match_feature_keys(self.keywords["scenario_outline"],
-                                       "scenario_outline")
-
-    def examples_token(self):
-        return self.match_feature_keys(self.keywords["examples"], "examples")
-
     def tag_token(self):
-        if not self.should_be_multiline:
-            match = re.findall("@(\w+)", self.line)
-            return [("tag", tag, self.index) for tag in match]
+        match = Lexer.TAG_PATTERN.findall(self.line)
+        return [("tag", tag, self.index) for tag in match]
 
     def feature_description_token(self):
         # feature description must go after feature
-        if not self.should_be_multiline:
-            if self.line and len(self.tokens) > 0 and\
-            self.tokens[-1][0] == "feature":
-                self.current_feature_desc.append(self.line)
+        if self.last_type == "feature":
+            self.current_feature_desc.append(self.line)
         return False
 
     def table_row_token(self):
-        if self.line[0] == "|":
-            return ("row", self.line, self.index)
-
-    def step_token(self):
-        if not self.should_be_multiline:
-            regex_str = "^\s*(%s)\s*(.*)" % (
-                "|".join(["(%s)" % self.keywords[key]
-                          for key in Lexer.STEP_KEYS]))
-            match = re.match(regex_str, self.line)
-            if match:
-                groups = match.groups()
-                return ("step", groups[-1], self.index)
-        return None
+        return ("row", self.line, self.index)
 
     def multiline_token(self):
-        if len(self.tokens) > 0 and self.tokens[-1][0] == "step":
+        if self.last_type == "step":
             if self.line == '"""' and not self.should_be_multiline:
                 # start multiline
                 self.should_be_multiline = True
@@ -177,13 +469,10 @@ class Lexer(object):
                 self.tokens.append(("multiline",
                                     "\n".join(self.current_multiline),
                                     self.multiline_start))
+                self.last_type = "multiline"
                 self.should_be_multiline = False
                 self.multiline_start = -1
+                self.current_multiline = []
             elif self.should_be_multiline:
                 # process multiline
-                if self.index > self.multiline_start:
-                    self.current_multiline.append(self.line)
-                else:
-                    line = self.line[3:].strip()
-                    if line:
-                        self.current_multiline.append(line)
+                self.current_multiline.append(self.line)
@@ -1,131 +1,596 @@
+"""
+Farmer's nodes
+
+The tree built by the parser. Nodes use __slots__, keywords and key types
+are interned, and nodes without tags or steps share one empty tuple instead
+of each holding an empty list; use add_tag and add_step to grow them.
+"""
+import re
+from collections import namedtuple
+
+try:
+    intern = intern
+except NameError:
+    from sys import intern
+
+# shared by every node that has no tags or steps
+EMPTY = ()
+
+
+def intern_string(value):
+    if type(value) is str:
+        return intern(value)
+    return value
+
+
+CELL_PATTERN = re.compile(r"((?:[^|\\]|\\.)*)\|")
+ESCAPE_PATTERN = re.compile(r"\\(.)")
+
+
+def split_row(row):
+    """Split a `| a | b |` table row into a tuple of its stripped cells.
+    `\\|` is a pipe inside a cell."""
+    row = row.strip()
+    if row.startswith("|"):
+        row = row[1:]
+    cells = []
+    end = 0
+    for match in CELL_PATTERN.finditer(row):
+        cells.append(match.group(1))
+        end = match.end()
+    if row[end:].strip():
+        # the closing pipe is missing
+        cells.append(row[end:])
+    if "\\" in row:
+        cells = [ESCAPE_PATTERN.sub(r"\1", cell) for cell in cells]
+    return tuple(cell.strip() for cell in cells)
+
+
 class Definition(object):
-    def __init__(self, keyword=None, name=None, key_type=None):
-        self.keyword = keyword
+    __slots__ = ("keyword", "name", "key_type", "line")
+
+    def __init__(self, keyword=None, name=None, key_type=None, line=None):
+        self.keyword = intern_string(keyword)
         self.name = name
-        self.key_type = key_type
+        self.key_type = intern_string(key_type)
+        # index of the source line the definition was read from
+        self.line = line
 
     def __str__(self):
         return "<%s: %s>" % (self.keyword, self.name)
 
 
 class FeatureDescription(Definition):
-    pass
+    __slots__ = ()
 
 
 class Tag(Definition):
-    pass
+    __slots__ = ()
+
+    def __init__(self, keyword=None, name=None, key_type=None, line=None):
+        # the same few tags show up all over a suite
+        super(Tag, self).__init__(keyword, intern_string(name), key_type,
+                                  line)
+
+
+class DataTable(object):
+    """A table of a step or examples block, stored by column.
+
+    Rows are split into cells once, when they are added; the first row is
+    the header and is kept apart from the columns. Iterating a table yields
+    Row views over the columns instead of copying the cells of every row.
+    """
+    __slots__ = ("header", "columns", "_positions", "_row_type")
+
+    def __init__(self, header=None, columns=None):
+        self.header = tuple(header) if header is not None else None
+        self.columns = columns if columns is not None else\
+            [[] for _ in self.header or EMPTY]
+        self._positions = None
+        self._row_type = None
+
+    @classmethod
+    def from_rows(cls, header, rows):
+        table = cls(header)
+        for cells in rows:
+            table.add_cells(cells)
+        return table
+
+    def add_row(self, row):
+        """Add a raw `| a | b |` row"""
+        self.add_cells(split_row(row))
+
+    def add_cells(self, cells):
+        if self.header is None:
+            self.header = tuple(cells)
+            self.columns = [[] for _ in cells]
+            return
+        columns = self.columns
+        if len(cells) > len(columns):
+            # a ragged row widens the table, earlier rows get empty cells
+            length = len(self)
+            self.header += ("",) * (len(cells) - len(columns))
+            columns.extend([""] * length for _ in range(len(cells) -
+                                                         len(columns)))
+            self._positions = self._row_type = None
+        for index, column in enumerate(columns):
+            column.append(cells[index] if index < len(cells) else "")
+
+    def __len__(self):
+        """Number of rows after the header"""
+        return len(self.columns[0]) if self.columns else 0
+
+    def __nonzero__(self):
+        return self.header is not None
+    __bool__ = __nonzero__
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield Row(self, index)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Table row out of range: %d" % index)
+        return Row(self, index)
+
+    def __eq__(self, other):
+        if not isinstance(other, DataTable):
+            return NotImplemented
+        return self.header == other.header and self.columns == other.columns
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<DataTable: %s, %d rows>" % (
+            " | ".join(self.header or EMPTY), len(self))
+
+    def __getstate__(self):
+        return (self.header, self.columns)
+
+    def __setstate__(self, state):
+        self.header, self.columns = state
+        self._positions = self._row_type = None
+
+    def position(self, name):
+        """Index of the column named name"""
+        if self._positions is None:
+            positions = {}
+            for index, column_name in enumerate(self.header or EMPTY):
+                positions.setdefault(column_name, index)
+            self._positions = positions
+        try:
+            return self._positions[name]
+        except KeyError:
+            raise KeyError("Table has no column: %s" % name)
+
+    def column(self, name_or_index):
+        """The cells of a column, not copied"""
+        if isinstance(name_or_index, int):
+            return self.columns[name_or_index]
+        return self.columns[self.position(name_or_index)]
+
+    def rows(self):
+        """Iterate the rows after the header as tuples of cells"""
+        return zip(*self.columns) if self.columns else iter(EMPTY)
+
+    def named_rows(self):
+        """Iterate the rows after the header as named tuples, with fields
+        named after the header. Cells that are not valid field names get
+        positional names `_0`, `_1`..."""
+        if self._row_type is None:
+            self._row_type = namedtuple("Row", self.header or EMPTY,
+                                        rename=True)
+        make = self._row_type._make
+        for cells in self.rows():
+            yield make(cells)
+
+    def to_columns(self):
+        """Copy the table as a list of columns, each a list of cells"""
+        return [list(column) for column in self.columns]
+
+    def to_rows(self):
+        """Copy the table as a list of tuples, the header first"""
+        if self.header is None:
+            return []
+        return [self.header] + list(self.rows())
+
+
+class Row(object):
+    """A view of one row of a DataTable; cells are looked up by column
+    index or header name"""
+    __slots__ = ("table", "index")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        if not isinstance(key, int):
+            key = self.table.position(key)
+        return self.table.columns[key][self.index]
+
+    def __len__(self):
+        return len(self.table.columns)
+
+    def __iter__(self):
+        index = self.index
+        for column in self.table.columns:
+            yield column[index]
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            other = tuple(other)
+        return tuple(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<Row %d: %s>" % (self.index, " | ".join(self))
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def as_tuple(self):
+        return tuple(self)
+
+    def as_dict(self):
+        return dict(zip(self.table.header, self))
 
 
 class Step(Definition):
-    pass
+    __slots__ = ("multiline", "table")
+
+    def __init__(self, keyword=None, name=None, key_type=None,
+                 multiline=None, table=None, line=None):
+        super(Step, self).__init__(keyword, name, key_type, line)
+        self.multiline = multiline
+        self.table = table or EMPTY
+
+    def add_row(self, row):
+        if self.table is EMPTY:
+            self.table = DataTable()
+        self.table.add_row(row)
 
 
 class StepsContainer(object):
+    __slots__ = ()
+
     def __init__(self, steps=None):
-        self.steps = steps or []
+        self.steps = steps or EMPTY
 
     @property
     def can_has_steps(self):
         return True
 
+    def add_step(self, step):
+        if type(self.steps) is not list:
+            self.steps = list(self.steps)
+        self.steps.append(step)
+
 
 class Taggable(object):
+    __slots__ = ()
+
     def __init__(self, tags=None):
-        self.tags = tags or []
+        self.tags = tags or EMPTY
 
     @property
     def can_has_tags(self):
         return True
 
+    def add_tag(self, tag):
+        if type(self.tags) is not list:
+            self.tags = list(self.tags)
+        self.tags.append(tag)
+
+
+class Examples(Definition, Taggable):
+    """An Examples block of a scenario outline; the first row of its table
+    names the placeholders"""
+    __slots__ = ("tags", "table")
+
+    def __init__(self, keyword=None, name=None, key_type=None, tags=None,
+                 table=None, line=None):
+        super(Examples, self).__init__(keyword, name, key_type, line)
+        Taggable.__init__(self, tags)
+        self.table = table or EMPTY
+
+    add_row = Step.add_row
+
+    @property
+    def header(self):
+        if self.table:
+            return self.table.header
+        return EMPTY
+
+    def rows(self):
+        """Iterate the rows after the header as tuples of cells"""
+        if self.table:
+            return self.table.rows()
+        return iter(EMPTY)
+
 
 class Feature(Definition, Taggable):
-    def __init__(self, keyword=None, name=None, key_type=None, tags=None):
-        super(Feature, self).__init__(keyword, name, key_type)
+    __slots__ = ("tags", "scenario_list", "background", "description")
+
+    def __init__(self, keyword=None, name=None, key_type=None, tags=None,
+                 line=None):
+        super(Feature, self).__init__(keyword, name, key_type, line)
         Taggable.__init__(self, tags)
         self.scenario_list = []
         self.background = None
+        self.description = None
 
     @classmethod
     def build(cls, element_collection):
-        child_steps = []
-        feature_elements = []
-        # get all elements by associating the steps with its parents and build
-        # all elements objects. We will associate the tags later on
-        for element_data in reversed(element_collection):
-            keyword, name, key_type = element_data
-            # get steps
-            if key_type == 'step':
-                child_steps.append(Step(keyword, name, key_type))
-            if key_type in ['scenario', 'scenario_outline', 'background']:
-                child_steps = list(reversed(child_steps))
-                # get scenario
-                if key_type == 'scenario':
-                    element = Scenario(keyword, name, key_type, child_steps)
-                # get scenario outline
-                if key_type == 'scenario_outline':
-                    element = ScenarioOutline(keyword, name, key_type, child_steps)
-                # get background
-                if key_type == 'background':
-                    element = Background(keyword, name, key_type, child_steps)
-                child_steps = []
-                feature_elements.append(element)
-            # initialize feature name
-            if key_type == 'feature':
-                feature_elements.append(Feature(keyword, name, key_type))
-            # initialize feature tag
-            if key_type == 'tag':
-                feature_elements.append(Tag(keyword, name, key_type))
-            # initialize description
-            if key_type == 'feature_description':
-                feature_elements.append(FeatureDescription(keyword, name, key_type))
-
-        # ok, now we associate the tag and description with its correct owner
-        index = 1
-        while (index < len(feature_elements)):
-            try:
-                if isinstance(feature_elements[index], Tag):
-                    previous = feature_elements[index-1]
-                    if previous.can_has_tags:
-                        previous.tags.append(feature_elements.pop(index))
-                else:
-                    index += 1
-            except:
-                continue
-        feature = None
-        # get the feature object out
-        for index, element in enumerate(feature_elements):
-            if isinstance(element, Feature):
-                feature = feature_elements.pop(index)
-        # concat everything and return the feature object
-        for element in feature_elements:
-            # add description
-            if isinstance(element, FeatureDescription):
-                feature.description = element.name
-            # add background
-            if isinstance(element, Background):
-                feature.background = element
-            # add scenario outline and scenario
-            if isinstance(element, ScenarioOutline)\
-               or isinstance(element, Scenario):
-                feature.scenario_list.append(element)
+        """Build a feature out of its (keyword, name, key_type) elements,
+        optionally followed by the source line index of each element"""
+        feature, description, background, scenario_list, tags =\
+            cls.build_parts(element_collection)
+        if feature is None:
+            return None
+        feature.description = description
+        feature.background = background
+        feature.scenario_list = scenario_list
+        for scenario in scenario_list:
+            scenario.feature = feature
         return feature
 
+    def flatten(self):
+        """Compute the effective steps and tags of every scenario at once,
+        the background steps and the feature tags being the same objects
+        for all of them. Returns the scenario list."""
+        background_steps = EMPTY
+        if self.background is not None:
+            background_steps = self.background.steps
+        for scenario in self.scenario_list:
+            scenario.feature = self
+            scenario._effective_steps = concat(background_steps,
+                                               scenario.steps)
+            scenario._effective_tags = concat(self.tags, scenario.tags)
+        return self.scenario_list
+
+    @classmethod
+    def build_parts(cls, element_collection):
+        """Build the nodes of element_collection without assembling them.
+
+        This is a single forward pass: tags are held until the feature,
+        background or scenario they decorate shows up, steps belong to the
+        last background or scenario, and table rows and multiline blocks to
+        the last step. Examples blocks belong to the last scenario outline
+        and collect the rows that follow them. Returns (feature,
+        description, background, scenario_list, dangling_tags).
+        """
+        feature = None
+        description = None
+        background = None
+        scenario_list = []
+        tags = []
+        # the element currently collecting steps, the last step and the
+        # examples block collecting rows
+        container = None
+        step = None
+        examples = None
+        for element in element_collection:
+            keyword, name, key_type = element[0], element[1], element[2]
+            line = element[3] if len(element) > 3 else None
+            if key_type == "step":
+                step = None
+                examples = None
+                if container is not None:
+                    step = Step(keyword, name, key_type, line=line)
+                    container.add_step(step)
+            elif key_type == "row":
+                if step is not None:
+                    step.add_row(name)
+                elif examples is not None:
+                    examples.add_row(name)
+            elif key_type == "multiline":
+                if step is not None:
+                    step.multiline = name
+            elif key_type == "tag":
+                tags.append(Tag(keyword, name, key_type, line))
+            elif key_type in STEPS_CONTAINERS:
+                container = STEPS_CONTAINERS[key_type](keyword, name, key_type,
+                                                       tags=tags, line=line)
+                tags = []
+                step = None
+                examples = None
+                if key_type == "background":
+                    background = container
+                else:
+                    scenario_list.append(container)
+            elif key_type == "feature":
+                feature = cls(keyword, name, key_type, tags, line)
+                tags = []
+            elif key_type == "feature_description":
+                description = name
+            elif key_type == "examples" and container is not None\
+                 and container.key_type == "scenario_outline":
+                examples = Examples(keyword, name, key_type, tags, line=line)
+                container.add_examples(examples)
+                tags = []
+                step = None
+            else:
+                step = None
+                examples = None
+        return feature, description, background, scenario_list, tags
+
+
+def concat(first, second):
+    """first followed by second, reusing either one when the other is
+    empty"""
+    if not first:
+        return second
+    if not second:
+        return first
+    return list(first) + list(second)
+
 
-class Scenario(Definition, Taggable, StepsContainer):
-    def __init__(self, keyword, name, key_type, steps=None, tags=None):
-        super(Scenario, self).__init__(keyword, name, key_type)
+class Inheriting(object):
+    """Mixin for scenarios: the steps and tags they run with, the
+    background steps and the feature tags included. Both are computed the
+    first time they are read, or for a whole feature by Feature.flatten,
+    and kept; flatten the feature again after changing it."""
+    __slots__ = ()
+
+    def __init__(self, feature=None):
+        # the feature the scenario belongs to, set by Feature.build
+        self.feature = feature
+        self._effective_steps = None
+        self._effective_tags = None
+
+    @property
+    def effective_steps(self):
+        if self._effective_steps is None:
+            feature = self.feature
+            if feature is not None and feature.background is not None:
+                self._effective_steps = concat(feature.background.steps,
+                                               self.steps)
+            else:
+                self._effective_steps = self.steps
+        return self._effective_steps
+
+    @property
+    def effective_tags(self):
+        if self._effective_tags is None:
+            feature = self.feature
+            if feature is not None:
+                self._effective_tags = concat(feature.tags, self.tags)
+            else:
+                self._effective_tags = self.tags
+        return self._effective_tags
+
+
+class Scenario(Definition, Taggable, StepsContainer, Inheriting):
+    __slots__ = ("tags", "steps", "feature", "_effective_steps",
+                 "_effective_tags")
+
+    def __init__(self, keyword, name, key_type, steps=None, tags=None,
+                 line=None, feature=None):
+        super(Scenario, self).__init__(keyword, name, key_type, line)
         Taggable.__init__(self, tags)
         StepsContainer.__init__(self, steps)
+        Inheriting.__init__(self, feature)
+
 
+class ScenarioOutline(Definition, Taggable, StepsContainer, Inheriting):
+    __slots__ = ("tags", "steps", "examples", "feature", "_effective_steps",
+                 "_effective_tags")
 
-class ScenarioOutline(Definition, Taggable, StepsContainer):
-    def __init__(self, keyword, name, key_type, steps=None, tags=None):
-        super(Scenario, self).__init__(keyword, name, key_type)
+    def __init__(self, keyword, name, key_type, steps=None, tags=None,
+                 line=None, examples=None, feature=None):
+        super(ScenarioOutline, self).__init__(keyword, name, key_type, line)
         Taggable.__init__(self, tags)
         StepsContainer.__init__(self, steps)
+        Inheriting.__init__(self, feature)
+        self.examples = examples or EMPTY
+
+    def add_examples(self, examples):
+        if type(self.examples) is not list:
+            self.examples = list(self.examples)
+        self.examples.append(examples)
+
+    def expand(self):
+        """Lazily yield one Scenario per example row.
+
+        The step templates are compiled once per examples block, and each
+        scenario is only built when the iteration reaches its row, so large
+        examples tables are never held as scenarios all at once.
+        """
+        for examples in self.examples:
+            columns = dict((name, index)
+                           for index, name in enumerate(examples.header))
+            name = Template(self.name, columns)
+            steps = [(step, Template(step.name, columns),
+                      step.multiline and Template(step.multiline, columns),
+                      step.table and TableTemplate(step.table, columns))
+                     for step in self.steps]
+            # scenarios of one examples block share their list of tags
+            tags = list(self.tags) + list(examples.tags)
+            for row in examples.rows():
+                scenario_steps = [
+                    Step(step.keyword, template.render(row), step.key_type,
+                         multiline and multiline.render(row),
+                         table and table.render(row), step.line)
+                    for step, template, multiline, table in steps]
+                yield Scenario(self.keyword, name.render(row), "scenario",
+                               scenario_steps, tags, self.line, self.feature)
+
+
+class Template(object):
+    """A text with <placeholder> names, compiled against the columns of an
+    examples table. Placeholders naming no column are left as they are."""
+    __slots__ = ("format", "indexes")
+    PLACEHOLDER = re.compile(r"<([^<>]*)>")
+
+    def __init__(self, text, columns):
+        parts = Template.PLACEHOLDER.split(text)
+        format_parts = [parts[0].replace("%", "%%")]
+        self.indexes = []
+        for position in range(1, len(parts), 2):
+            index = columns.get(parts[position])
+            if index is None:
+                format_parts.append("<%s>" % parts[position].replace("%", "%%"))
+            else:
+                format_parts.append("%s")
+                self.indexes.append(index)
+            format_parts.append(parts[position + 1].replace("%", "%%"))
+        self.format = "".join(format_parts)
+        if not self.indexes:
+            # nothing to substitute
+            self.format = text
+
+    def render(self, row):
+        if not self.indexes:
+            return self.format
+        try:
+            return self.format % tuple([row[index] for index in self.indexes])
+        except IndexError:
+            return self.format % tuple([row[index] if index < len(row) else ""
+                                        for index in self.indexes])
+
+
+class TableTemplate(object):
+    """The cells of a step table compiled as templates"""
+    __slots__ = ("header", "columns")
+
+    def __init__(self, table, columns):
+        self.header = [Template(cell, columns) for cell in table.header]
+        self.columns = [[Template(cell, columns) for cell in column]
+                        for column in table.columns]
+
+    def render(self, row):
+        return DataTable([cell.render(row) for cell in self.header],
+                         [[cell.render(row) for cell in column]
+                          for column in self.columns])
+
 
 class Background(Definition, Taggable, StepsContainer):
-    def __init__(self, keyword, name, key_type, steps=None, tags=None):
-        super(Scenario, self).__init__(keyword, name, key_type)
+    __slots__ = ("tags", "steps")
+
+    def __init__(self, keyword, name, key_type, steps=None, tags=None,
+                 line=None):
+        super(Background, self).__init__(keyword, name, key_type, line)
         Taggable.__init__(self, tags)
         StepsContainer.__init__(self, steps)
+
+
+# elements that own steps, by key type
+STEPS_CONTAINERS = {
+    "background": Background,
+    "scenario": Scenario,
+    "scenario_outline": ScenarioOutline,
+}
@@ -1,12 +1,18 @@
+from .lazy import index_features
 from .lexer import Lexer
 from .node import Feature, Tag
+from .stats import instrument_lexer, timer
 
 class Parser(object):
 
-    def __init__(self, lexer=None):
+    def __init__(self, lexer=None, stats=None):
         if not lexer:
-            lexer = Lexer()
+            lexer = Lexer(stats=stats)
+        elif stats is not None and lexer.stats is None:
+            instrument_lexer(lexer, stats)
         self.lexer = lexer
+        # a farmer.stats.Stats object timing every phase of a parse
+        self.stats = stats
 
     def _find_feature_position(self, lex_struct):
         """Scan for the feature element position in the lex struct list"""
@@ -17,28 +23,98 @@ class Parser(object):
         """Given a struct list that may contain multiple features, extract
         those features into a feature list. An element of the list will
         resemble a feature, and will contain a list of all feature elements
-        such as belonging background, scenarios, etc
+        such as belonging background, scenarios, etc. Tags right before a
+        feature belong to that feature.
         """
-        indices = self._find_feature_position(lex_struct)
-        feature_list = [lex_struct[i:j]
-                    for i, j in zip([0]+indices, indices+[None])]
-        # bubble down all tags that do not have any children
-        for index, collection in enumerate(feature_list):
-            bubble_tags = []
-            for element in reversed(collection):
-                if element[2] == 'tag':
-                    bubble_tags.append(collection.pop())
-                else:
-                    break
-            try:
-                for tag in bubble_tags:
-                    feature_list[index+1].insert(0, tag)
-            except:
-                break
-        return [item for item in feature_list if len(item) > 0]
+        feature_list = []
+        current = []
+        pending_tags = []
+        for element in lex_struct:
+            key_type = element[2]
+            if key_type == "tag":
+                pending_tags.append(element)
+                continue
+            if key_type == "feature":
+                if current:
+                    feature_list.append(current)
+                current = pending_tags
+            else:
+                current.extend(pending_tags)
+            pending_tags = []
+            current.append(element)
+        current.extend(pending_tags)
+        if current:
+            feature_list.append(current)
+        return feature_list
 
+    def parse(self, source):
+        """Lex and parse source, an iterable of lines such as a file handle"""
+        return self.parse_lex(self._lex(self.lexer.iter_elements(source)))
+
+    def parse_path(self, path, encoding="utf-8"):
+        """Lex and parse the file at path through a memory map"""
+        return self.parse_lex(self._lex(self.lexer.iter_file_elements(
+            path, encoding)))
+
+    def parse_bytes(self, content, encoding="utf-8"):
+        """Lex and parse the raw bytes of a file, like parse_path does"""
+        return self.parse_lex(self._lex(self.lexer.iter_bytes_elements(
+            content, encoding)))
+
+    def _lex(self, elements):
+        if self.stats is None:
+            return list(elements)
+        start = timer()
+        elements = list(elements)
+        self.stats.observe("phase_seconds", timer() - start,
+                           (("phase", "lex"),))
+        return elements
+
+    def parse_strict(self, source, path=None):
+        """Parse source, raising a farmer.validate.ParseError at the first
+        structural error instead of building whatever can be built"""
+        from .validate import Validator
+        elements = []
+        Validator(self.lexer).check(source, path, elements)
+        return self.parse_lex(elements)
+
+    def parse_index(self, source):
+        """Parse only the headers of source. Backgrounds and scenarios lex
+        and build their steps the first time they are read."""
+        return index_features(source, self.lexer)
 
     def parse_lex(self, lex_struct):
+        if self.stats is not None:
+            return self._parse_lex_instrumented(lex_struct)
         features = [Feature.build(feature_elements)
                     for feature_elements in self._segment_lex(lex_struct)]
         return [f for f in features if f]
+
+    def _parse_lex_instrumented(self, lex_struct):
+        """parse_lex, timing the segmentation and the build of every
+        feature"""
+        stats = self.stats
+        start = timer()
+        segments = self._segment_lex(lex_struct)
+        stats.observe("phase_seconds", timer() - start,
+                      (("phase", "segment"),))
+        features = []
+        build_start = timer()
+        for feature_elements in segments:
+            start = timer()
+            feature = Feature.build(feature_elements)
+            stats.observe("build_feature_seconds", timer() - start)
+            if not feature:
+                continue
+            features.append(feature)
+            stats.count("parser_features_total")
+            containers = list(feature.scenario_list)
+            if feature.background is not None:
+                containers.append(feature.background)
+            for container in containers:
+                stats.count("parser_elements_total",
+                            labels=(("type", container.key_type),))
+                stats.count("parser_steps_total", len(container.steps))
+        stats.observe("phase_seconds", timer() - build_start,
+                      (("phase", "build"),))
+        return features
@@ -0,0 +1,331 @@
+"""
+Farmer's binary format
+
+A compact encoding of parsed feature trees, loaded back without going
+through the lexer. Every string (keywords, names, tags, table cells) is
+stored once in a string table and referred to by its index; integers are
+varints. The steps and examples of each background and scenario are
+prefixed by their size in bytes, so a headers only load jumps over them
+without decoding them.
+
+    header     MAGIC, version byte
+    strings    byte length, then the utf-8 strings separated by NUL
+    features   count, then one feature after the other
+
+Strings and lines that may be None are stored shifted by one, 0 being None.
+"""
+from itertools import islice
+from .node import (DataTable, EMPTY, Examples, Feature, Step,
+                   STEPS_CONTAINERS, Tag)
+
+MAGIC = b"FRMR"
+VERSION = 2
+
+
+class FormatError(ValueError):
+    pass
+
+
+class Encoder(object):
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = []
+        self.indexes = {}
+
+    def varint(self, value, out=None):
+        out = self.out if out is None else out
+        while value >= 0x80:
+            out.append((value & 0x7f) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    def string(self, value):
+        """Write a reference to value, None included"""
+        if value is None:
+            self.out.append(0)
+            return
+        index = self.indexes.get(value)
+        if index is None:
+            index = self.indexes[value] = len(self.strings)
+            self.strings.append(value)
+        self.varint(index + 1)
+
+    def line(self, line):
+        self.varint(0 if line is None else line + 1)
+
+    def definition(self, node):
+        self.string(node.keyword)
+        self.string(node.name)
+        self.string(node.key_type)
+        self.line(node.line)
+
+    def tags(self, tags):
+        self.varint(len(tags))
+        for tag in tags:
+            self.definition(tag)
+
+    def table(self, table):
+        if not table:
+            self.out.append(0)
+            return
+        self.varint(len(table.header) + 1)
+        for cell in table.header:
+            self.string(cell)
+        self.varint(len(table))
+        for column in table.columns:
+            for cell in column:
+                self.string(cell)
+
+    def container(self, container):
+        self.definition(container)
+        self.tags(container.tags)
+        # the body goes to a buffer of its own to be prefixed by its size
+        out = self.out
+        self.out = body = bytearray()
+        self.varint(len(container.steps))
+        for step in container.steps:
+            self.definition(step)
+            self.string(step.multiline)
+            self.table(step.table)
+        examples_list = getattr(container, "examples", None)
+        if examples_list is not None:
+            self.varint(len(examples_list))
+            for examples in examples_list:
+                self.definition(examples)
+                self.tags(examples.tags)
+                self.table(examples.table)
+        self.out = out
+        self.varint(len(body))
+        out.extend(body)
+
+    def feature(self, feature):
+        self.definition(feature)
+        self.tags(feature.tags)
+        self.string(feature.description)
+        if feature.background is None:
+            self.out.append(0)
+        else:
+            self.out.append(1)
+            self.container(feature.background)
+        self.varint(len(feature.scenario_list))
+        for scenario in feature.scenario_list:
+            self.container(scenario)
+
+    def encode(self, features):
+        self.varint(len(features))
+        for feature in features:
+            self.feature(feature)
+        for string in self.strings:
+            if u"\0" in string:
+                raise FormatError("Can not encode a NUL character: %r" %
+                                  string)
+        strings = u"\0".join(self.strings).encode("utf-8")
+        data = bytearray(MAGIC)
+        data.append(VERSION)
+        # an empty table and a table of one empty string would look alike
+        self.varint(len(strings) + 1 if self.strings else 0, data)
+        data.extend(strings)
+        data.extend(self.out)
+        return bytes(data)
+
+
+def read_varints(data, position):
+    """Decode every varint of data from position on into a list"""
+    values = []
+    append = values.append
+    byte_iter = iter(data)
+    if position:
+        next(islice(byte_iter, position - 1, position), None)
+    for byte in byte_iter:
+        if byte < 0x80:
+            append(byte)
+            continue
+        value = byte & 0x7f
+        shift = 7
+        while True:
+            byte = next(byte_iter)
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        append(value)
+    return values
+
+
+class VarintReader(object):
+    """Iterator decoding the varints of data one at a time from position
+    on, able to skip bytes. Slower per value than read_varints, for reads
+    that skip most of the data."""
+
+    def __init__(self, data, position):
+        self.data = data
+        self.position = position
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        data = self.data
+        position = self.position
+        value = 0
+        shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        self.position = position
+        return value
+    next = __next__
+
+    def skip(self, size):
+        self.position += size
+        if self.position > len(self.data):
+            raise IndexError(self.position)
+
+
+def read_strings(data):
+    """Check the header of data and decode its string table. Returns the
+    strings, shifted by one with None first, and where the body starts."""
+    if data[:len(MAGIC)] != MAGIC:
+        raise FormatError("Not a farmer binary feature file")
+    version = data[len(MAGIC)]
+    if version != VERSION:
+        raise FormatError("Unsupported farmer binary version: %d" % version)
+    position = len(MAGIC) + 1
+    size = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        size |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    if not size:
+        return [None], position
+    end = position + size - 1
+    if end > len(data):
+        raise IndexError(end)
+    strings = [None]
+    strings.extend(bytes(data[position:end]).decode("utf-8").split(u"\0"))
+    return strings, end
+
+
+def decode(data, headers_only=False):
+    data = bytearray(data)
+    strings, position = read_strings(data)
+    if headers_only:
+        values = VarintReader(data, position)
+    else:
+        values = iter(read_varints(data, position))
+    # tags and steps are by far the most numerous nodes, they are filled in
+    # directly; strings are already shared through the string table
+    new = object.__new__
+
+    # the readers below consume values in the order Encoder wrote them
+
+    def read_line():
+        line = next(values) - 1
+        return line if line >= 0 else None
+
+    def read_tags():
+        count = next(values)
+        if not count:
+            return None
+        tags = []
+        for _ in range(count):
+            tag = new(Tag)
+            tag.keyword = strings[next(values)]
+            tag.name = strings[next(values)]
+            tag.key_type = strings[next(values)]
+            tag.line = read_line()
+            tags.append(tag)
+        return tags
+
+    def read_table():
+        width = next(values)
+        if not width:
+            return None
+        header = [strings[next(values)] for _ in range(width - 1)]
+        length = next(values)
+        columns = [[strings[next(values)] for _ in range(length)]
+                   for _ in header]
+        return DataTable(header, columns)
+
+    def read_container():
+        keyword = strings[next(values)]
+        name = strings[next(values)]
+        key_type = strings[next(values)]
+        line = read_line()
+        container = STEPS_CONTAINERS[key_type](keyword, name, key_type,
+                                               tags=read_tags(), line=line)
+        # byte size of the steps and examples
+        size = next(values)
+        if headers_only:
+            values.skip(size)
+            return container
+        steps = []
+        for _ in range(next(values)):
+            step = new(Step)
+            step.keyword = strings[next(values)]
+            step.name = strings[next(values)]
+            step.key_type = strings[next(values)]
+            step.line = read_line()
+            step.multiline = strings[next(values)]
+            step.table = read_table() or EMPTY
+            steps.append(step)
+        if steps:
+            container.steps = steps
+        if key_type == "scenario_outline":
+            for _ in range(next(values)):
+                keyword = strings[next(values)]
+                name = strings[next(values)]
+                examples_type = strings[next(values)]
+                line = read_line()
+                container.add_examples(Examples(
+                    keyword, name, examples_type, read_tags(), read_table(),
+                    line))
+        return container
+
+    features = []
+    for _ in range(next(values)):
+        keyword = strings[next(values)]
+        name = strings[next(values)]
+        key_type = strings[next(values)]
+        line = read_line()
+        feature = Feature(keyword, name, key_type, read_tags(), line)
+        feature.description = strings[next(values)]
+        if next(values):
+            feature.background = read_container()
+        feature.scenario_list = [read_container()
+                                 for _ in range(next(values))]
+        for scenario in feature.scenario_list:
+            scenario.feature = feature
+        features.append(feature)
+    return features
+
+
+def dumps(features):
+    """Encode a list of features into bytes"""
+    return Encoder().encode(features)
+
+
+def loads(data, headers_only=False):
+    """Decode the features encoded by dumps. With headers_only, the bytes
+    of steps and examples are jumped over without being decoded, and every
+    background and scenario is left without them."""
+    try:
+        return decode(data, headers_only)
+    except (IndexError, KeyError, StopIteration, UnicodeDecodeError):
+        raise FormatError("Truncated or corrupt farmer binary data")
+
+
+def dump(features, handle):
+    handle.write(dumps(features))
+
+
+def load(handle, headers_only=False):
+    return loads(handle.read(), headers_only)
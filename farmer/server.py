@@ -0,0 +1,300 @@
+"""
+Farmer's parse server
+
+Keep the parsed features of a suite in memory and answer queries about
+them over a Unix socket, so the tools working on a suite share one warm
+process instead of each parsing every file. Files are watched by polling
+their modification time and size; the changed ones are parsed again.
+
+The protocol is one JSON object per line both ways. A request names a
+method and its params, the answer holds either a result or an error:
+
+    {"method": "scenarios", "params": {"tags": "@smoke and not @wip"}}
+    {"result": [{"path": "login.feature", "line": 12, ...}]}
+
+Lines count from 1 in requests and answers.
+"""
+import errno
+import json
+import os
+import signal
+import socket
+import stat
+import sys
+import threading
+import time
+from .batch import expand_paths, parse_paths
+from .tags import TagExpressionError, TagIndex
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+class RequestError(ValueError):
+    """A request the server can not answer, sent back as its error"""
+
+
+def file_state(path):
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return (getattr(info, "st_mtime_ns", info.st_mtime), info.st_size)
+
+
+def line_of(node):
+    return None if node.line is None else node.line + 1
+
+
+def step_dict(step):
+    return {
+        "keyword": step.keyword,
+        "name": step.name,
+        "line": line_of(step),
+        "multiline": step.multiline,
+        "table": step.table.to_rows() if step.table else None,
+    }
+
+
+def scenario_dict(entry):
+    scenario = entry.scenario
+    return {
+        "path": entry.path,
+        "line": line_of(scenario),
+        "name": scenario.name,
+        "key_type": scenario.key_type,
+        "feature": entry.feature.name,
+        "tags": [tag.name for tag in scenario.effective_tags],
+    }
+
+
+class Suite(object):
+    """The parsed features of the files matched by paths_or_globs, kept up
+    to date by scan(). Queries and scans may come from several threads."""
+
+    def __init__(self, paths_or_globs, cache=None, workers=None):
+        self.paths_or_globs = paths_or_globs
+        self.cache = cache
+        self.workers = workers
+        # path -> (modification time, size) when it was parsed
+        self.states = {}
+        # path -> features, and path -> error of the files failing to parse
+        self.features = {}
+        self.errors = {}
+        self.index = TagIndex()
+        # lock guards the parsed data, scan_lock keeps scans one at a time
+        self.lock = threading.Lock()
+        self.scan_lock = threading.Lock()
+
+    def scan(self):
+        """Parse the new and changed files and drop the deleted ones.
+        Returns the lists of (changed, removed) paths."""
+        with self.scan_lock:
+            return self._scan()
+
+    def _scan(self):
+        paths = expand_paths(self.paths_or_globs)
+        states = dict((path, file_state(path)) for path in paths)
+        changed = [path for path in paths if states[path] is not None and
+                   states[path] != self.states.get(path)]
+        removed = [path for path in self.states
+                   if states.get(path) is None]
+        # parse outside of the lock, queries go on meanwhile
+        workers = self.workers if len(changed) > 1 else 1
+        results = parse_paths(changed, workers, self.cache)
+        with self.lock:
+            for path in removed:
+                del self.states[path]
+                self.features.pop(path, None)
+                self.errors.pop(path, None)
+                self.index.remove(path)
+            for result in results:
+                self.states[result.path] = states[result.path]
+                if result.ok:
+                    self.features[result.path] = result.features
+                    self.errors.pop(result.path, None)
+                    self.index.update(result.path, result.features)
+                else:
+                    self.features.pop(result.path, None)
+                    self.errors[result.path] = str(result.error)
+                    self.index.remove(result.path)
+        return changed, removed
+
+    def files(self):
+        with self.lock:
+            return [{"path": path, "error": self.errors.get(path)}
+                    for path in sorted(self.states)]
+
+    def scenarios(self, tags=None, path=None):
+        """Summaries of the scenarios matching a tag expression, of a
+        single file when path is given"""
+        with self.lock:
+            if tags:
+                try:
+                    entries = self.index.select(tags)
+                except TagExpressionError as error:
+                    raise RequestError(str(error))
+            else:
+                entries = [entry for entry in self.index.scenarios
+                           if entry is not None]
+            return [scenario_dict(entry) for entry in entries
+                    if path is None or entry.path == path]
+
+    def steps(self, path, line):
+        """The scenario of path starting at line, with its steps, the
+        background steps first"""
+        with self.lock:
+            for scenario_id in self.index.paths.get(path, ()):
+                entry = self.index.scenarios[scenario_id]
+                if line_of(entry.scenario) == line:
+                    summary = scenario_dict(entry)
+                    summary["steps"] = [
+                        step_dict(step)
+                        for step in entry.scenario.effective_steps]
+                    return summary
+        raise RequestError("No scenario at %s:%s" % (path, line))
+
+    def status(self):
+        with self.lock:
+            return {"files": len(self.states), "errors": len(self.errors),
+                    "scenarios": len(self.index)}
+
+
+class Watcher(threading.Thread):
+    """Rescan a suite every interval seconds until stopped"""
+
+    def __init__(self, suite, interval=1.0):
+        super(Watcher, self).__init__()
+        self.daemon = True
+        self.suite = suite
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.suite.scan()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            answer = self.server.answer(line)
+            self.wfile.write(json.dumps(answer).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+def remove_stale_socket(path):
+    """Remove the socket left at path by a server that did not shut down.
+    Anything else there, a live server included, is left alone and raises
+    an OSError."""
+    if not stat.S_ISSOCK(os.lstat(path).st_mode):
+        raise OSError(errno.EEXIST, "Not a socket, refusing to replace it",
+                      path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except (IOError, OSError):
+        os.unlink(path)
+        return
+    finally:
+        client.close()
+    raise OSError(errno.EADDRINUSE, "A server already answers on the socket",
+                  path)
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Answer the requests about a suite on the Unix socket at path"""
+    daemon_threads = True
+    METHODS = ("status", "files", "scenarios", "steps", "scan")
+
+    def __init__(self, path, suite):
+        if os.path.lexists(path):
+            remove_stale_socket(path)
+        socketserver.UnixStreamServer.__init__(self, path, RequestHandler)
+        self.suite = suite
+
+    def answer(self, line):
+        try:
+            request = json.loads(line.decode("utf-8"))
+            method = request["method"]
+            params = request.get("params") or {}
+            if method not in self.METHODS:
+                raise RequestError("Unknown method: %s" % method)
+            if method == "scan":
+                changed, removed = self.suite.scan()
+                result = {"changed": changed, "removed": removed}
+            else:
+                result = getattr(self.suite, method)(**params)
+        except Exception as error:
+            # any failure is answered, the client waits for a line
+            return {"error": "%s: %s" % (type(error).__name__, error)}
+        return {"result": result}
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def serve(socket_path, paths_or_globs, interval=1.0, cache=None,
+          workers=None):
+    """Parse the suite, then answer requests on socket_path until
+    interrupted"""
+    suite = Suite(paths_or_globs, cache, workers)
+    suite.scan()
+    watcher = Watcher(suite, interval)
+    server = Server(socket_path, suite)
+    watcher.start()
+    try:
+        # stopping the server with a plain kill cleans up the socket too
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    except ValueError:
+        # not the main thread
+        pass
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+        server.server_close()
+
+
+def request(socket_path, method, timeout=30.0, **params):
+    """Send one request to a running server and return its result, raising
+    RequestError with the error it answered"""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path)
+        client.sendall(json.dumps({"method": method, "params": params})
+                       .encode("utf-8") + b"\n")
+        handle = client.makefile("rb")
+        try:
+            answer = json.loads(handle.readline().decode("utf-8"))
+        finally:
+            handle.close()
+    finally:
+        client.close()
+    if "error" in answer:
+        raise RequestError(answer["error"])
+    return answer["result"]
+
+
+def wait_for(socket_path, timeout=10.0):
+    """Wait until a server answers on socket_path"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return request(socket_path, "status")
+        except (IOError, OSError):
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
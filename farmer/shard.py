@@ -0,0 +1,197 @@
+"""
+Farmer's shard planner
+
+Split the scenarios of a suite across CI shards of about the same cost,
+rather than splitting by file. The cost of a scenario is estimated from its
+steps, the rows of their tables and, for outlines, the number of scenarios
+it expands to; timings of earlier runs replace the estimate where they are
+known. Scenarios are then placed by the longest processing time rule: the
+most expensive first, each on the shard with the least cost so far.
+
+    planner = ShardPlanner(4, timings=load_timings("timings.json"))
+    planner.add_results(parse_paths("features/"))
+    planner.write(planner.plan(), "shards/")
+"""
+import heapq
+import io
+import json
+import os
+
+
+def load_timings(path):
+    """Read a JSON object of scenario id ("path:line") to seconds. A missing
+    file gives no timings."""
+    if not os.path.exists(path):
+        return {}
+    with io.open(path, encoding="utf-8") as handle:
+        timings = json.load(handle)
+    return dict((key, float(seconds)) for key, seconds in timings.items())
+
+
+class Job(object):
+    """A scenario or scenario outline to run on one shard"""
+    __slots__ = ("path", "scenario", "estimate", "seconds")
+
+    def __init__(self, path, scenario, estimate, seconds=None):
+        self.path = path
+        self.scenario = scenario
+        self.estimate = estimate
+        # timing of an earlier run, if any
+        self.seconds = seconds
+
+    @property
+    def id(self):
+        """path:line of the scenario, lines counting from 1 as test runners
+        take them"""
+        return "%s:%d" % (self.path, (self.scenario.line or 0) + 1)
+
+    def __repr__(self):
+        return "<Job: %s (%s)>" % (self.id, self.estimate)
+
+
+class Shard(object):
+    def __init__(self, index):
+        self.index = index
+        self.jobs = []
+        self.cost = 0.0
+
+    def __len__(self):
+        return len(self.jobs)
+
+    def __repr__(self):
+        return "<Shard: %d (%d jobs, cost %.2f)>" % (self.index,
+                                                     len(self.jobs), self.cost)
+
+    def manifest(self, shards, cost):
+        return {
+            "shard": self.index,
+            "shards": shards,
+            "cost": self.cost,
+            "scenarios": [{"id": job.id, "path": job.path,
+                           "line": (job.scenario.line or 0) + 1,
+                           "name": job.scenario.name, "cost": cost(job)}
+                          for job in self.jobs],
+        }
+
+
+class ShardPlanner(object):
+    """Collect the scenarios of a suite and balance them over `shards`.
+
+    The estimated cost of a scenario is one scenario_cost, plus step_cost
+    for every step, its own and its background's, plus row_cost for every
+    row of their tables. An outline costs as much as all the scenarios its
+    examples expand to. When timings are given, costs are in seconds: the
+    estimates of untimed scenarios are scaled by the seconds per estimated
+    unit of the timed ones.
+    """
+
+    def __init__(self, shards, timings=None, scenario_cost=1.0,
+                 step_cost=1.0, row_cost=0.1):
+        if shards < 1:
+            raise ValueError("At least one shard is needed")
+        self.shards = shards
+        self.timings = timings or {}
+        self.scenario_cost = scenario_cost
+        self.step_cost = step_cost
+        self.row_cost = row_cost
+        self.jobs = []
+
+    @classmethod
+    def from_results(cls, results, shards, **kwargs):
+        """Build a planner out of farmer.batch.ParseResult objects"""
+        planner = cls(shards, **kwargs)
+        planner.add_results(results)
+        return planner
+
+    def steps_cost(self, steps):
+        cost = 0.0
+        for step in steps:
+            cost += self.step_cost
+            if step.table:
+                # the first row of a step table is data as well
+                cost += self.row_cost * (len(step.table) + 1)
+        return cost
+
+    def estimate(self, scenario, background=None):
+        cost = self.scenario_cost + self.steps_cost(scenario.steps)
+        if background is not None:
+            cost += self.steps_cost(background.steps)
+        if scenario.key_type == "scenario_outline":
+            runs = sum(len(examples.table) for examples in scenario.examples)
+            cost *= runs
+        return cost
+
+    def add(self, path, features):
+        for feature in features:
+            for scenario in feature.scenario_list:
+                job = Job(path, scenario,
+                          self.estimate(scenario, feature.background))
+                job.seconds = self.timings.get(job.id)
+                self.jobs.append(job)
+
+    def add_results(self, results):
+        for result in results:
+            if result.ok:
+                self.add(result.path, result.features)
+
+    def seconds_per_estimate(self):
+        """Seconds per estimated unit of the timed jobs, None without
+        timings"""
+        seconds = estimate = 0.0
+        for job in self.jobs:
+            if job.seconds is not None:
+                seconds += job.seconds
+                estimate += job.estimate
+        if not estimate:
+            return None
+        return seconds / estimate
+
+    def cost_function(self):
+        scale = self.seconds_per_estimate()
+        if scale is None:
+            return lambda job: job.estimate
+
+        def cost(job):
+            if job.seconds is not None:
+                return job.seconds
+            return job.estimate * scale
+        return cost
+
+    def plan(self):
+        """Place the jobs on the shards, returning the list of Shard
+        objects. Jobs of the same cost keep the order they were added in,
+        and every shard lists its jobs in that order as well."""
+        cost = self.cost_function()
+        order = dict((id(job), position)
+                     for position, job in enumerate(self.jobs))
+        jobs = sorted(self.jobs, key=lambda job: (-cost(job),
+                                                  order[id(job)]))
+        shards = [Shard(index) for index in range(self.shards)]
+        heap = [(0.0, index) for index in range(self.shards)]
+        for job in jobs:
+            load, index = heapq.heappop(heap)
+            shard = shards[index]
+            shard.jobs.append(job)
+            shard.cost = load + cost(job)
+            heapq.heappush(heap, (shard.cost, index))
+        for shard in shards:
+            shard.jobs.sort(key=lambda job: order[id(job)])
+        return shards
+
+    def manifests(self, shards):
+        cost = self.cost_function()
+        return [shard.manifest(self.shards, cost) for shard in shards]
+
+    def write(self, shards, directory, name="shard-%d.json"):
+        """Write the manifest of every shard to directory, returning their
+        paths"""
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        paths = []
+        for manifest in self.manifests(shards):
+            path = os.path.join(directory, name % manifest["shard"])
+            with io.open(path, "w", encoding="utf-8") as handle:
+                handle.write(json.dumps(manifest, indent=2, sort_keys=True,
+                                        ensure_ascii=False))
+            paths.append(path)
+        return paths
@@ -0,0 +1,171 @@
+"""
+Farmer's instrumentation
+
+Counters and timings of the lexer and parser, for telling which of them a
+slow parse is spending its time in. A Stats object is handed to a Lexer or a
+Parser; without one they run the plain, uninstrumented code.
+
+    stats = Stats()
+    Parser(stats=stats).parse(handle)
+    print(stats.to_prometheus())
+"""
+import json
+import time
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+def label_text(labels):
+    if not labels:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (key, str(value).replace(
+        "\\", "\\\\").replace('"', '\\"')) for key, value in labels)
+
+
+class Stats(object):
+    """Collects counters and timings, each a name and a tuple of (label,
+    value) pairs. callback, when given, is called with (kind, name, labels,
+    value) for every record, kind being "count" or "time"."""
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        # (name, labels) -> number
+        self.counters = {}
+        # (name, labels) -> [count, total seconds, max seconds]
+        self.timings = {}
+
+    def count(self, name, value=1, labels=()):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+        if self.callback is not None:
+            self.callback("count", name, labels, value)
+
+    def observe(self, name, seconds, labels=()):
+        key = (name, labels)
+        timing = self.timings.get(key)
+        if timing is None:
+            self.timings[key] = [1, seconds, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+            if seconds > timing[2]:
+                timing[2] = seconds
+        if self.callback is not None:
+            self.callback("time", name, labels, seconds)
+
+    def counter(self, name, **labels):
+        """Value of a counter, 0 when it was never counted"""
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def timing(self, name, **labels):
+        """(count, total seconds, max seconds) of a timing"""
+        return tuple(self.timings.get((name, tuple(sorted(labels.items()))),
+                                      (0, 0.0, 0.0)))
+
+    def merge(self, other):
+        """Add the records of other, for instance the stats of a worker"""
+        for (name, labels), value in other.counters.items():
+            self.counters[name, labels] = self.counters.get(
+                (name, labels), 0) + value
+        for key, (count, total, longest) in other.timings.items():
+            timing = self.timings.setdefault(key, [0, 0.0, 0.0])
+            timing[0] += count
+            timing[1] += total
+            timing[2] = max(timing[2], longest)
+
+    def reset(self):
+        self.counters.clear()
+        self.timings.clear()
+
+    def to_dict(self):
+        return {
+            "counters": [{"name": name, "labels": dict(labels),
+                          "value": value}
+                         for (name, labels), value
+                         in sorted(self.counters.items())],
+            "timings": [{"name": name, "labels": dict(labels),
+                         "count": count, "seconds": total, "max": longest}
+                        for (name, labels), (count, total, longest)
+                        in sorted(self.timings.items())],
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), sort_keys=True, **kwargs)
+
+    def to_prometheus(self, prefix="farmer"):
+        """The stats in the Prometheus text exposition format: counters as
+        counters, timings as summaries without quantiles"""
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = "%s_%s" % (prefix, name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append("# TYPE %s counter" % metric)
+            lines.append("%s%s %s" % (metric, label_text(labels), value))
+        for (name, labels), (count, total, longest)\
+                in sorted(self.timings.items()):
+            metric = "%s_%s" % (prefix, name)
+            if metric not in typed:
+                typed.add(metric)
+                lines.append("# TYPE %s summary" % metric)
+            lines.append("%s_sum%s %r" % (metric, label_text(labels), total))
+            lines.append("%s_count%s %d" % (metric, label_text(labels),
+                                            count))
+        return "\n".join(lines) + "\n"
+
+
+def instrument_lexer(lexer, stats):
+    """Route the hot paths of lexer through counting and timing wrappers.
+    Only this lexer instance is touched; the wrappers shadow its methods
+    as instance attributes."""
+    scan_line = lexer.scan_line
+    finish_scan = lexer.finish_scan
+    keyword_token = lexer.keyword_token
+    tokenize = lexer.tokenize
+    tokens_total = "lexer_tokens_total"
+
+    def counted_scan_line(index, line):
+        before = len(lexer.tokens)
+        start = timer()
+        scan_line(index, line)
+        seconds = timer() - start
+        stats.count("lexer_lines_total")
+        tokens = lexer.tokens
+        if len(tokens) > before:
+            for token in tokens[before:]:
+                stats.count(tokens_total, labels=(("type", token[0]),))
+            token_type = tokens[-1][0]
+        elif lexer.should_be_multiline or lexer.line == '"""':
+            token_type = "multiline"
+        else:
+            token_type = "none"
+        stats.observe("lexer_scan_seconds", seconds,
+                      (("type", token_type),))
+
+    def counted_finish_scan():
+        before = len(lexer.tokens)
+        finish_scan()
+        for token in lexer.tokens[before:]:
+            stats.count(tokens_total, labels=(("type", token[0]),))
+
+    def counted_keyword_token():
+        token = keyword_token()
+        stats.count("lexer_regex_matches_total",
+                    labels=(("result", "hit" if token else "miss"),))
+        return token
+
+    def timed_tokenize(source):
+        start = timer()
+        try:
+            return tokenize(source)
+        finally:
+            stats.observe("phase_seconds", timer() - start,
+                          (("phase", "tokenize"),))
+
+    lexer.scan_line = counted_scan_line
+    lexer.finish_scan = counted_finish_scan
+    lexer.keyword_token = counted_keyword_token
+    lexer.tokenize = timed_tokenize
+    lexer.stats = stats
+    return lexer
@@ -0,0 +1,288 @@
+"""
+Farmer's step index
+
+An index of the step text of a whole suite. Steps are normalized and
+deduplicated, so every distinct text is matched against the step
+definitions once however often the suite uses it, and definitions are
+prefiltered by the literal prefix of their regex instead of being tried one
+after the other.
+"""
+import re
+
+# characters that end the literal prefix of a regex
+SPECIAL = set(".^$*+?{}[]\\|()")
+QUANTIFIERS = set("*?{")
+
+
+def normalize(text):
+    """Step text with its runs of whitespace collapsed to single spaces"""
+    return " ".join(text.split())
+
+
+def literal_prefix(pattern):
+    """The text every match of pattern, anchored at the start of the step,
+    has to begin with, or None when the pattern may match anywhere"""
+    if pattern.startswith("^"):
+        position = 1
+    elif pattern.startswith("\\A"):
+        position = 2
+    else:
+        return None
+    if has_alternation(pattern):
+        return None
+    prefix = []
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "\\":
+            escaped = pattern[position + 1:position + 2]
+            if not escaped or escaped.isalnum():
+                # \d, \w, \b... and the like are classes, not literals
+                break
+            prefix.append(escaped)
+            position += 2
+        elif char in SPECIAL:
+            if char in QUANTIFIERS and prefix:
+                # the last literal is optional or repeated
+                prefix.pop()
+            break
+        else:
+            prefix.append(char)
+            position += 1
+    return "".join(prefix)
+
+
+def has_alternation(pattern):
+    """Whether pattern has a `|` outside of any group or character class"""
+    depth = 0
+    position = 0
+    in_class = False
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "\\":
+            position += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            # a `]` right after `[` or `[^` is a literal
+            if pattern[position + 1:position + 2] == "^":
+                position += 1
+            if pattern[position + 1:position + 2] == "]":
+                position += 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+        position += 1
+    return False
+
+
+class StepDefinitions(object):
+    """A set of step definition regexes compiled for bulk matching.
+
+    Definitions anchored at the start of the step go into a trie keyed by
+    the words of their literal prefix, so a step is only tried against the
+    definitions whose prefix it starts with. The other definitions are also
+    folded into one alternation, checked once per step before trying them
+    one by one.
+    """
+    # patterns that can not be folded into the alternation: backreferences
+    # would point at the wrong groups
+    BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+    def __init__(self, patterns):
+        self.patterns = []
+        # word -> [definitions, children]; a definition is (index, prefix,
+        # regex) and sits at the node of the last complete word of its
+        # prefix, the root holding the prefixes shorter than a word
+        self.trie = [[], {}]
+        # definitions tried against every step
+        self.anywhere = []
+        for index, pattern in enumerate(patterns):
+            if isinstance(pattern, type(re.compile(""))):
+                regex = pattern
+            else:
+                regex = re.compile(pattern)
+            self.patterns.append(regex)
+            prefix = None
+            if not regex.flags & re.IGNORECASE:
+                prefix = literal_prefix(regex.pattern)
+            if not prefix:
+                self.anywhere.append((index, None, regex))
+                continue
+            node = self.trie
+            for word in prefix.split(" ")[:-1]:
+                node = node[1].setdefault(word, [[], {}])
+            node[0].append((index, prefix, regex))
+        self.anywhere_filter = self.fold(self.anywhere)
+
+    @classmethod
+    def fold(cls, definitions):
+        """One regex matching wherever any of definitions does, or None"""
+        if len(definitions) < 2:
+            return None
+        default_flags = re.compile("").flags
+        for index, prefix, regex in definitions:
+            if regex.flags != default_flags or\
+               cls.BACKREFERENCE.search(regex.pattern):
+                return None
+        try:
+            return re.compile("|".join("(?:%s)" % regex.pattern
+                                       for index, prefix, regex
+                                       in definitions))
+        except (re.error, OverflowError, AssertionError):
+            # duplicate group names, misplaced inline flags, too many groups
+            return None
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def candidates(self, text):
+        """The definitions that may match text"""
+        node = self.trie
+        candidates = list(node[0])
+        for word in text.split(" "):
+            node = node[1].get(word)
+            if node is None:
+                break
+            candidates.extend(node[0])
+        if self.anywhere:
+            if self.anywhere_filter is None or\
+               self.anywhere_filter.search(text):
+                candidates.extend(self.anywhere)
+        return candidates
+
+    def match(self, text):
+        """List the (definition index, match object) pairs of every
+        definition matching text, in definition order"""
+        matches = []
+        for index, prefix, regex in self.candidates(text):
+            if prefix and not text.startswith(prefix):
+                continue
+            match = regex.search(text)
+            if match:
+                matches.append((index, match))
+        if len(matches) > 1:
+            matches.sort(key=lambda pair: pair[0])
+        return matches
+
+
+class IndexedStep(object):
+    """A step of the index, with the scenario and file it comes from"""
+    __slots__ = ("path", "scenario", "step")
+
+    def __init__(self, path, scenario, step):
+        self.path = path
+        self.scenario = scenario
+        self.step = step
+
+    def __repr__(self):
+        return "<IndexedStep: %s: %s>" % (self.path, self.step.name)
+
+
+class StepIndex(object):
+    """Map every normalized step text of a suite to the steps using it.
+
+    Scenario outlines are indexed through the scenarios they expand to, so
+    placeholders are filled in, unless expand_outlines is false.
+    """
+
+    def __init__(self, expand_outlines=True):
+        self.expand_outlines = expand_outlines
+        # normalized text -> [IndexedStep]
+        self.steps = {}
+        # path -> set of the texts of its steps
+        self.paths = {}
+        self.count = 0
+
+    def __len__(self):
+        """Number of distinct step texts"""
+        return len(self.steps)
+
+    def __contains__(self, text):
+        return normalize(text) in self.steps
+
+    @classmethod
+    def from_results(cls, results, expand_outlines=True):
+        """Build an index out of farmer.batch.ParseResult objects"""
+        index = cls(expand_outlines)
+        for result in results:
+            index.add(result.path, result.features)
+        return index
+
+    def scenarios(self, feature):
+        if feature.background is not None:
+            yield feature.background
+        for scenario in feature.scenario_list:
+            if self.expand_outlines and\
+               scenario.key_type == "scenario_outline":
+                for expanded in scenario.expand():
+                    yield expanded
+            else:
+                yield scenario
+
+    def add(self, path, features):
+        if path in self.paths:
+            self.remove(path)
+        steps = self.steps
+        texts = self.paths[path] = set()
+        for feature in features:
+            for scenario in self.scenarios(feature):
+                for step in scenario.steps:
+                    text = normalize(step.name)
+                    entry = IndexedStep(path, scenario, step)
+                    try:
+                        steps[text].append(entry)
+                    except KeyError:
+                        steps[text] = [entry]
+                    texts.add(text)
+                    self.count += 1
+
+    def remove(self, path):
+        for text in self.paths.pop(path, ()):
+            entries = self.steps[text]
+            kept = [entry for entry in entries if entry.path != path]
+            self.count -= len(entries) - len(kept)
+            if kept:
+                self.steps[text] = kept
+            else:
+                del self.steps[text]
+
+    def update(self, path, features):
+        """Replace the steps of a file that was parsed again"""
+        self.add(path, features)
+
+    def texts(self):
+        return sorted(self.steps)
+
+    def occurrences(self, text):
+        """The IndexedStep objects using text, in the order they were
+        added"""
+        return self.steps.get(normalize(text), [])
+
+    def duplicates(self, min_count=2):
+        """List (text, occurrences) of the texts used at least min_count
+        times, the most used first"""
+        duplicates = [(text, entries) for text, entries in self.steps.items()
+                      if len(entries) >= min_count]
+        duplicates.sort(key=lambda pair: (-len(pair[1]), pair[0]))
+        return duplicates
+
+    def match(self, definitions):
+        """Match every distinct text against definitions, a StepDefinitions
+        or a list of regexes. Returns a dict of text to its list of
+        (definition index, match object); texts no definition matches map
+        to an empty list, and more than one pair means the step is
+        ambiguous."""
+        if not isinstance(definitions, StepDefinitions):
+            definitions = StepDefinitions(definitions)
+        match = definitions.match
+        return dict((text, match(text)) for text in self.steps)
+
+    def undefined(self, definitions):
+        """Sorted texts no definition matches"""
+        return sorted(text for text, matches in self.match(definitions).items()
+                      if not matches)
@@ -0,0 +1,259 @@
+"""
+Farmer's tag index
+
+An inverted index from tag to scenarios over a whole suite, answering tag
+expressions such as `@smoke and not (@slow or @wip)` with bitset operations.
+Scenarios inherit the tags of their feature.
+"""
+import re
+
+
+class TagExpressionError(ValueError):
+    pass
+
+
+class TagExpression(object):
+    """A compiled tag expression.
+
+    The grammar is, from loosest to tightest binding: `or`, `and`, `not`,
+    then `@tag` or a parenthesised expression.
+    """
+    TOKEN_PATTERN = re.compile(r"\s*(?:(\()|(\))|@([^\s()]+)|(\w+))")
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = self.tokenize(text)
+        self.position = 0
+        self.evaluate = self.parse_or()
+        if self.position != len(self.tokens):
+            raise TagExpressionError("Unexpected %r in tag expression: %s" % (
+                self.tokens[self.position][1], text))
+        # the expression is compiled, the tokens are not needed anymore
+        del self.tokens
+
+    def __repr__(self):
+        return "<TagExpression: %s>" % self.text
+
+    @classmethod
+    def tokenize(cls, text):
+        tokens = []
+        position = 0
+        text = text.rstrip()
+        while position < len(text):
+            match = cls.TOKEN_PATTERN.match(text, position)
+            if not match:
+                raise TagExpressionError("Invalid tag expression: %s" % text)
+            position = match.end()
+            if match.group(1):
+                tokens.append(("(", "("))
+            elif match.group(2):
+                tokens.append((")", ")"))
+            elif match.group(3):
+                tokens.append(("tag", match.group(3)))
+            elif match.group(4) in ("and", "or", "not"):
+                tokens.append((match.group(4), match.group(4)))
+            else:
+                raise TagExpressionError("Unknown operator %r in: %s" % (
+                    match.group(4), text))
+        return tokens
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][0]
+        return None
+
+    def take(self, kind):
+        if self.peek() != kind:
+            raise TagExpressionError("Expected %s in tag expression: %s" % (
+                kind, self.text))
+        token = self.tokens[self.position]
+        self.position += 1
+        return token[1]
+
+    # every parse_* method returns a function of (index, everything) that
+    # evaluates to the bitset of matching scenarios
+
+    def parse_or(self):
+        terms = [self.parse_and()]
+        while self.peek() == "or":
+            self.take("or")
+            terms.append(self.parse_and())
+        if len(terms) == 1:
+            return terms[0]
+
+        def evaluate(index, everything):
+            bits = 0
+            for term in terms:
+                bits |= term(index, everything)
+            return bits
+        return evaluate
+
+    def parse_and(self):
+        terms = [self.parse_not()]
+        while self.peek() == "and":
+            self.take("and")
+            terms.append(self.parse_not())
+        if len(terms) == 1:
+            return terms[0]
+
+        def evaluate(index, everything):
+            bits = everything
+            for term in terms:
+                bits &= term(index, everything)
+                if not bits:
+                    break
+            return bits
+        return evaluate
+
+    def parse_not(self):
+        if self.peek() == "not":
+            self.take("not")
+            term = self.parse_not()
+            return lambda index, everything:\
+                everything & ~term(index, everything)
+        return self.parse_atom()
+
+    def parse_atom(self):
+        if self.peek() == "(":
+            self.take("(")
+            term = self.parse_or()
+            self.take(")")
+            return term
+        name = self.take("tag")
+        return lambda index, everything: index.get(name, 0)
+
+
+class IndexedScenario(object):
+    """A scenario of the index, with the feature and file it comes from"""
+    __slots__ = ("path", "feature", "scenario")
+
+    def __init__(self, path, feature, scenario):
+        self.path = path
+        self.feature = feature
+        self.scenario = scenario
+
+    def __repr__(self):
+        return "<IndexedScenario: %s: %s>" % (self.path, self.scenario.name)
+
+
+class TagIndex(object):
+    """Map every tag to the bitset of the scenarios carrying it.
+
+    Each scenario gets an id, its bit in the bitsets. Files can be added,
+    removed and updated one at a time; ids of removed scenarios are dropped
+    and the index is compacted once they outnumber the live ones.
+    """
+
+    def __init__(self):
+        # id -> IndexedScenario, or None once removed
+        self.scenarios = []
+        # tag name -> bitset of scenario ids
+        self.tags = {}
+        # bitset of the scenarios that were not removed
+        self.live = 0
+        # path -> range of the ids of its scenarios
+        self.paths = {}
+        self.removed = 0
+        self._compiled = {}
+
+    def __len__(self):
+        return len(self.scenarios) - self.removed
+
+    @classmethod
+    def from_results(cls, results):
+        """Build an index out of farmer.batch.ParseResult objects"""
+        index = cls()
+        for result in results:
+            index.add(result.path, result.features)
+        return index
+
+    def add(self, path, features):
+        if path in self.paths:
+            self.remove(path)
+        base = len(self.scenarios)
+        # bitsets of this file alone, shifted into place once per tag, so
+        # adding a file does not copy the suite wide bitsets per scenario
+        local = {}
+        for feature in features:
+            feature_tags = [tag.name for tag in feature.tags]
+            for scenario in feature.scenario_list:
+                bit = 1 << (len(self.scenarios) - base)
+                self.scenarios.append(IndexedScenario(path, feature, scenario))
+                for name in feature_tags:
+                    local[name] = local.get(name, 0) | bit
+                for tag in scenario.tags:
+                    local[tag.name] = local.get(tag.name, 0) | bit
+        count = len(self.scenarios) - base
+        self.paths[path] = range(base, base + count)
+        self.live |= ((1 << count) - 1) << base
+        tags = self.tags
+        for name, bits in local.items():
+            tags[name] = tags.get(name, 0) | (bits << base)
+
+    def remove(self, path):
+        ids = self.paths.pop(path, ())
+        if not ids:
+            return
+        mask = ((1 << len(ids)) - 1) << ids[0]
+        for scenario_id in ids:
+            self.scenarios[scenario_id] = None
+        self.removed += len(ids)
+        self.live &= ~mask
+        for name, bits in list(self.tags.items()):
+            bits &= ~mask
+            if bits:
+                self.tags[name] = bits
+            else:
+                del self.tags[name]
+        if self.removed > len(self):
+            self.compact()
+
+    def update(self, path, features):
+        """Replace the scenarios of a file that was parsed again"""
+        self.add(path, features)
+
+    def compact(self):
+        """Renumber the live scenarios, dropping the ids of removed ones"""
+        entries = self.scenarios
+        self.__init__()
+        features_by_path = {}
+        paths = []
+        for entry in entries:
+            if entry is None:
+                continue
+            features = features_by_path.get(entry.path)
+            if features is None:
+                features = features_by_path[entry.path] = []
+                paths.append(entry.path)
+            if not features or features[-1] is not entry.feature:
+                features.append(entry.feature)
+        for path in paths:
+            self.add(path, features_by_path[path])
+
+    def compile(self, expression):
+        try:
+            return self._compiled[expression]
+        except KeyError:
+            compiled = self._compiled[expression] = TagExpression(expression)
+            return compiled
+
+    def bits(self, expression):
+        """Bitset of the scenarios matching a tag expression"""
+        return self.compile(expression).evaluate(self.tags, self.live)
+
+    def count(self, expression):
+        return bin(self.bits(expression)).count("1")
+
+    def select(self, expression):
+        """List the IndexedScenario objects matching a tag expression, in the
+        order they were added"""
+        # binary digits, least significant first: finding the set bits in a
+        # string is linear, where masking them off one by one is not
+        digits = bin(self.bits(expression))[:1:-1]
+        scenarios = self.scenarios
+        selected = []
+        position = digits.find("1")
+        while position >= 0:
+            selected.append(scenarios[position])
+            position = digits.find("1", position + 1)
+        return selected
@@ -1,7 +1,24 @@
 from attest import Tests
 from .lexer import lexer
 from .parser import parser
+from .batch import batch
+from .cache import cache
+from .incremental import incremental
+from .lazy import lazy
+from .node import node
+from .tags import tags
+from .aio import aio
+from .serialize import serialize
+from .stats import stats
+from .steps import steps
+from .validate import validate
+from .shard import shard
+from .tokens import tokens
+from .compare import compare
+from .server import server
 
 collection = Tests([
-    lexer, parser
+    lexer, parser, node, batch, cache, incremental,
+    lazy, tags, aio, serialize, stats, steps,
+    validate, shard, tokens, compare, server
 ])
@@ -0,0 +1,98 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from attest import Tests
+from farmer.aio import parse_many, parse_stream
+from farmer.lexer import Lexer
+from farmer.parser import Parser
+from .test_helper import get_feature
+
+aio = Tests()
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+def stream_of(content):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(content)
+        reader.feed_eof()
+        return await parse_stream(reader)
+    return read()
+
+class Chunks(object):
+    """Async iterable of byte chunks of a fixed size"""
+
+    def __init__(self, content, size):
+        self.chunks = [content[start:start + size]
+                       for start in range(0, len(content), size)]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+@aio.test
+def parse_stream_matches_parse():
+    with open(get_feature("complex"), "rb") as handle:
+        content = handle.read()
+    with open(get_feature("complex")) as handle:
+        expected = Parser().parse(handle)[0]
+    feature = run(stream_of(content))[0]
+    assert feature.name == expected.name
+    assert [x.name for x in feature.scenario_list] ==\
+            [x.name for x in expected.scenario_list]
+    assert feature.scenario_list[1].steps[0].table ==\
+            expected.scenario_list[1].steps[0].table
+
+@aio.test
+def parse_stream_of_chunks():
+    content = u"# language: de\nFunktion: Gest\xfcckelt\r\n  Szenario: a\n"\
+              u"    Angenommen ein Schritt".encode("utf-8")
+    for size in (1, 3, 7, len(content)):
+        features = run(parse_stream(Chunks(content, size)))
+        assert features[0].name == u"Gest\xfcckelt"
+        step = features[0].scenario_list[0].steps[0]
+        assert (step.keyword, step.name, step.line) ==\
+                ("Angenommen", "ein Schritt", 3)
+
+@aio.test
+def parse_stream_of_long_lines():
+    name = "x" * (200 * 1024)
+    content = ("Feature: Long\n  Scenario: a\n    Given %s\n" % name)\
+        .encode("utf-8")
+    features = run(stream_of(content))
+    assert features[0].scenario_list[0].steps[0].name == name
+
+@aio.test
+def feed_line_matches_iter_elements():
+    with open(get_feature("outline")) as handle:
+        lines = handle.readlines()
+    lexer = Lexer()
+    lexer.start_feed()
+    elements = []
+    for line in lines:
+        lexer.feed_line(line)
+        elements.extend(lexer.pop_elements())
+    lexer.end_feed()
+    elements.extend(lexer.pop_elements())
+    assert elements == list(Lexer().iter_elements(lines))
+
+@aio.test
+def parse_many_keeps_path_order():
+    paths = [get_feature(name) for name in
+             ["simple", "complex", "outline", "simple_with_comments"]]
+    with ThreadPoolExecutor(2) as executor:
+        results = run(parse_many(paths + ["missing.feature"], executor,
+                                 concurrency=2, batch_size=2))
+    assert [result.path for result in results] ==\
+            paths + ["missing.feature"]
+    assert all(result.ok for result in results[:-1])
+    assert not results[-1].ok
+    assert results[2].features[0].name == "Eating"
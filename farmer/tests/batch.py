@@ -0,0 +1,51 @@
+import os
+import pickle
+import shutil
+import tempfile
+from attest import Tests
+from farmer import parse_paths
+from farmer.batch import expand_paths
+from farmer.node import Feature
+from .test_helper import get_feature
+
+batch = Tests()
+
+@batch.test
+def expand_globs_in_order():
+    features = os.path.dirname(get_feature("simple"))
+    paths = expand_paths([get_feature("simple"),
+                          os.path.join(features, "simple*.feature")])
+    assert paths[0] == get_feature("simple")
+    assert len(paths) == len(set(paths)) == 4
+    assert paths[1:] == sorted(paths[1:])
+
+@batch.test
+def parse_paths_on_a_pool():
+    paths = [get_feature("complex"), get_feature("simple")]
+    results = parse_paths(paths, workers=2)
+    assert [result.path for result in results] == paths
+    assert all(result.ok for result in results)
+    assert isinstance(results[0].features[0], Feature)
+    assert results[1].features[0].scenario_list[0].steps[0].name ==\
+            "there is a step"
+
+@batch.test
+def parse_results_are_picklable():
+    result = parse_paths(get_feature("complex"), workers=1)[0]
+    feature = pickle.loads(pickle.dumps(result)).features[0]
+    assert feature.name == "Feature Text"
+    assert len(feature.background.steps) == 2
+
+@batch.test
+def errors_are_collected_per_file():
+    directory = tempfile.mkdtemp()
+    try:
+        broken = os.path.join(directory, "broken.feature")
+        with open(broken, "w") as handle:
+            handle.write("# language: xx\nFeature: Broken\n")
+        results = parse_paths([broken, get_feature("simple")], workers=2)
+        assert not results[0].ok
+        assert isinstance(results[0].error, KeyError)
+        assert results[1].ok
+    finally:
+        shutil.rmtree(directory)
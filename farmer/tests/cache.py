@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from attest import Tests
+from farmer import parse_paths
+from farmer.cache import ParseCache
+from .test_helper import get_feature
+
+cache = Tests()
+
+@cache.context
+def cache_directory():
+    directory = tempfile.mkdtemp()
+    try:
+        yield directory
+    finally:
+        shutil.rmtree(directory)
+
+@cache.test
+def unchanged_file_is_loaded_from_cache(directory):
+    parse_cache = ParseCache(directory)
+    first = parse_cache.parse_file(get_feature("complex"))
+    second = parse_cache.parse_file(get_feature("complex"))
+    assert (parse_cache.misses, parse_cache.hits) == (1, 1)
+    assert second[0].name == first[0].name
+    assert [s.name for s in second[0].scenario_list] ==\
+            [s.name for s in first[0].scenario_list]
+
+@cache.test
+def key_depends_on_content_and_language(directory):
+    content = b"Feature: Testing\n"
+    assert ParseCache(directory).key(content) ==\
+            ParseCache(directory).key(content)
+    assert ParseCache(directory).key(content) !=\
+            ParseCache(directory).key(content + b"\n")
+    assert ParseCache(directory).key(content) !=\
+            ParseCache(directory, lang="de").key(content)
+
+@cache.test
+def least_recently_used_entries_are_evicted(directory):
+    parse_cache = ParseCache(directory)
+    parse_cache.parse_file(get_feature("simple"))
+    parse_cache.parse_file(get_feature("complex"))
+    entries = sorted(parse_cache.entries())
+    os.utime(entries[0][2], (0, 0))
+    parse_cache.evict(parse_cache.size() - 1)
+    assert [entry[2] for entry in parse_cache.entries()] == [entries[1][2]]
+
+@cache.test
+def parse_paths_with_cache(directory):
+    paths = [get_feature("complex"), get_feature("simple")]
+    cold = parse_paths(paths, workers=2, cache=directory)
+    warm = parse_paths(paths, workers=1, cache=ParseCache(directory))
+    assert len(os.listdir(directory)) == 2
+    assert [r.features[0].name for r in cold] ==\
+            [r.features[0].name for r in warm]
+
+@cache.test
+def byte_order_mark_is_skipped_with_and_without_cache(directory):
+    path = os.path.join(directory, "bom.feature")
+    with open(path, "wb") as handle:
+        handle.write(b"\xef\xbb\xbfFeature: Bom\n  Scenario: s\n")
+    cache_directory = os.path.join(directory, "cache")
+    uncached = parse_paths([path], workers=1)[0].features
+    cached = parse_paths([path], workers=1, cache=cache_directory)
+    assert [f.name for f in uncached] == [f.name for f in cached[0].features]\
+        == ["Bom"]
+
+@cache.test
+def unicode_spaces_parse_alike_with_and_without_cache(directory):
+    path = os.path.join(directory, "spaces.feature")
+    with open(path, "wb") as handle:
+        handle.write(u"Feature: Spaces\n\u3000Scenario: s\n"
+                     u"\xa0  Given a step\n".encode("utf-8"))
+    cache_directory = os.path.join(directory, "cache")
+    uncached = parse_paths([path], workers=1)[0].features
+    cached = parse_paths([path], workers=1, cache=cache_directory)
+    describe = lambda features: [(f.description, [(s.name, len(s.steps))
+                                 for s in f.scenario_list]) for f in features]
+    assert describe(cached[0].features) == describe(uncached)
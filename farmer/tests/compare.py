@@ -0,0 +1,125 @@
+import io
+from attest import Tests
+import farmer
+from farmer.compare import fingerprint
+from farmer.parser import Parser
+from .test_helper import get_feature
+
+compare = Tests()
+
+OLD = u"""\
+@web
+Feature: Shopping
+  Background:
+    Given a shop
+
+  Scenario: add to basket
+    Given a product
+    When I add it to the basket
+    Then the basket has 1 item
+
+  @slow
+  Scenario: checkout
+    Given a full basket
+    When I check out
+    Then I pay
+
+  Scenario: search
+    When I search for "cucumber"
+    Then I see 3 results
+
+  Scenario: browse
+    When I browse
+"""
+
+NEW = u"""\
+@web
+Feature: Shopping
+  Background:
+    Given a shop
+
+  Scenario: put in basket
+    Given a product
+    When I add it to the basket
+    Then the basket has 1 item
+
+  @fast
+  Scenario: checkout
+    Given a full basket
+    When I check out with a card
+    Then I pay
+    And I get a receipt
+
+  Scenario: search
+    When I search for "cucumber"
+    Then I see 3 results
+
+  Scenario: wishlist
+    When I wish
+"""
+
+def parse(text):
+    return Parser().parse(io.StringIO(text))[0]
+
+@compare.test
+def same_feature_has_no_changes():
+    with open(get_feature("complex")) as handle:
+        old = Parser().parse(handle)[0]
+    with open(get_feature("complex")) as handle:
+        new = Parser().parse(handle)[0]
+    changes = farmer.diff(old, new)
+    assert not changes
+    assert changes.touched() == []
+    assert fingerprint(old.scenario_list[1]) ==\
+        fingerprint(new.scenario_list[1])
+    assert fingerprint(old.scenario_list[0]) !=\
+        fingerprint(old.scenario_list[1])
+
+@compare.test
+def scenario_changes():
+    changes = farmer.diff(parse(OLD), parse(NEW))
+    assert changes.background is None and not changes.name_changed
+    assert [(change.kind, change.name) for change in changes.scenarios] == [
+        ("renamed", "put in basket"), ("changed", "checkout"),
+        ("added", "wishlist"), ("removed", "browse")]
+    assert changes.renamed[0].old.name == "add to basket"
+    assert not changes.renamed[0].steps
+    checkout = changes.changed[0]
+    assert (checkout.tags_added, checkout.tags_removed) == (("fast",),
+                                                            ("slow",))
+    assert [(step.kind, step.old and step.old.name, step.new.name)
+            for step in checkout.steps] == [
+        ("changed", "I check out", "I check out with a card"),
+        ("added", None, "I get a receipt")]
+    assert [scenario.name for scenario in changes.touched()] == [
+        "put in basket", "checkout", "wishlist"]
+
+@compare.test
+def background_and_feature_tags_touch_everything():
+    new = parse(NEW.replace("Given a shop", "Given an empty shop"))
+    changes = farmer.diff(parse(NEW), new)
+    assert changes.background.kind == "changed"
+    assert changes.scenarios == []
+    assert len(changes.touched()) == 4
+    changes = farmer.diff(parse(NEW), parse(NEW.replace("@web", "@mobile")))
+    assert (changes.tags_added, changes.tags_removed) == (("mobile",),
+                                                          ("web",))
+    assert len(changes.touched()) == 4
+
+@compare.test
+def outline_examples():
+    with open(get_feature("outline")) as handle:
+        text = handle.read()
+    changes = farmer.diff(parse(text), parse(text.replace("100", "101")))
+    assert [change.kind for change in changes.scenarios] == ["changed"]
+    assert changes.scenarios[0].examples_changed
+    assert changes.scenarios[0].steps == []
+
+@compare.test
+def added_and_removed_features():
+    changes = farmer.diff(None, parse(OLD))
+    assert [change.kind for change in changes.scenarios] == ["added"] * 4
+    assert changes.background.kind == "added"
+    changes = farmer.diff(parse(OLD), None)
+    assert [change.kind for change in changes.scenarios] == ["removed"] * 4
+    assert changes.touched() == []
@@ -0,0 +1,17 @@
+Feature: Eating
+    Scenario Outline: eating <start> cucumbers
+        Given there are <start> cucumbers
+        When I eat <eat> cucumbers
+            |eaten|left|
+            |<eat>|<left>|
+        Then I should have <left> cucumbers
+
+        Examples: small
+            | start | eat | left |
+            |  12   |  5  |  7   |
+            |  20   |  5  |  15  |
+
+        @big
+        Examples: big
+            | start | eat | left |
+            |  100  |  1  |  99  |
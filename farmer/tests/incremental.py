@@ -0,0 +1,116 @@
+from attest import Tests
+from farmer.incremental import IncrementalDocument, signature
+from farmer.parser import Parser
+from .test_helper import get_feature
+
+incremental = Tests()
+
+def load(name):
+    with open(get_feature(name)) as handle:
+        return IncrementalDocument(handle)
+
+def snapshot(feature):
+    blocks = list(feature.scenario_list)
+    if feature.background is not None:
+        blocks.insert(0, feature.background)
+    return [(signature(block), block.line,
+             [tag.line for tag in block.tags],
+             [step.line for step in block.steps],
+             [(examples.line, [tag.line for tag in examples.tags])
+              for examples in getattr(block, "examples", ())])
+            for block in blocks]
+
+def assert_matches_full_parse(document):
+    expected = Parser().parse(document.lines)[0]
+    assert snapshot(document.feature) == snapshot(expected)
+
+@incremental.test
+def edit_a_step():
+    document = load("complex")
+    edit = document.apply_edit(19, 20, ["        But yet another step"])
+    assert not edit.reparsed
+    assert [s.name for s in edit.changed] == ["Reading a Scenario"]
+    assert edit.added == edit.removed == []
+    assert document.feature.scenario_list[0].steps[1].name ==\
+            "yet another step"
+    assert_matches_full_parse(document)
+
+@incremental.test
+def insert_lines_shift_later_scenarios():
+    document = load("complex")
+    edit = document.apply_edit(20, 20, ["        And one more", "",
+                                        "    Scenario: Inserted",
+                                        "        Given it is new"])
+    assert [s.name for s in edit.added] == ["Inserted"]
+    assert [s.name for s in edit.changed] == ["Reading a Scenario"]
+    assert document.feature.scenario_list[-1].line == 41
+    assert_matches_full_parse(document)
+
+@incremental.test
+def remove_a_scenario():
+    document = load("complex")
+    edit = document.apply_edit(36, 44, [])
+    assert [s.name for s in edit.removed] == ["Hammerzeit"]
+    assert len(document.feature.scenario_list) == 2
+    assert_matches_full_parse(document)
+
+@incremental.test
+def edit_background():
+    document = load("complex")
+    edit = document.apply_edit(14, 15, ["        And this is changed"])
+    assert [s.key_type for s in edit.changed] == ["background"]
+    assert document.feature.background.steps[1].name == "this is changed"
+    assert_matches_full_parse(document)
+
+@incremental.test
+def header_edit_reparses():
+    document = load("complex")
+    edit = document.apply_edit(3, 4, ["Feature: Renamed"])
+    assert edit.reparsed
+    assert document.feature.name == "Renamed"
+    assert edit.changed == edit.added == edit.removed == []
+
+@incremental.test
+def many_edits_match_full_parse():
+    document = load("complex")
+    edits = [(17, 17, ["        And inserted"]),
+             (23, 25, ["        Given replaced", "          |x|y|"]),
+             (30, 30, ["    @new", "    Scenario: Split", "      Given a"]),
+             (8, 8, ["    # a comment in the header"]),
+             (40, 41, [])]
+    for start, end, lines in edits:
+        document.apply_edit(start, end, lines)
+        assert_matches_full_parse(document)
+    # edits above an outline shift its examples and their tags
+    with open(get_feature("outline")) as handle:
+        lines = handle.read().splitlines()
+    document = IncrementalDocument(lines[:1] + ["    Scenario: Before",
+                                                "        Given a step"] +
+                                   lines[1:])
+    edits = [(2, 2, ["        And another step", "        And more"]),
+             (3, 4, []),
+             (4, 4, ["        Then a step", ""])]
+    for start, end, lines in edits:
+        edit = document.apply_edit(start, end, lines)
+        assert not edit.reparsed
+        assert_matches_full_parse(document)
+    assert [examples.line for examples in
+            document.feature.scenario_list[1].examples] == [13, 19]
+
+@incremental.test
+def effective_steps_follow_edits():
+    document = load("complex")
+    document.apply_edit(19, 20, ["        But yet another step"])
+    first, second = document.feature.scenario_list[:2]
+    assert first.feature is document.feature
+    assert [step.name for step in first.effective_steps] == [
+        "this is a background step", "this is another one",
+        "there is a step", "yet another step"]
+    assert [tag.name for tag in first.effective_tags] == [
+        "tag1", "tag2", "tag3", "tag4"]
+    assert second.effective_steps[1].name == "this is another one"
+    document.apply_edit(14, 15, ["        And this is changed"])
+    assert [step.name for step in second.effective_steps[:2]] == [
+        "this is a background step", "this is changed"]
+    assert [step.name for step in first.effective_steps[:2]] == [
+        "this is a background step", "this is changed"]
@@ -0,0 +1,98 @@
+from attest import Tests
+from farmer.incremental import signature
+from farmer.parser import Parser
+from .test_helper import get_feature
+
+lazy = Tests()
+
+def parse_both(name):
+    with open(get_feature(name)) as handle:
+        indexed = Parser().parse_index(handle)
+    with open(get_feature(name)) as handle:
+        parsed = Parser().parse(handle)
+    return indexed, parsed
+
+@lazy.test
+def index_has_headers_without_loading_steps():
+    indexed, parsed = parse_both("complex")
+    feature = indexed[0]
+    assert feature.name == "Feature Text"
+    assert [x.name for x in feature.tags] == ["tag1", "tag2"]
+    assert feature.description == parsed[0].description
+    assert [x.name for x in feature.scenario_list] ==\
+            [x.name for x in parsed[0].scenario_list]
+    assert [x.line_range for x in feature.scenario_list] ==\
+            [(17, 21), (22, 37), (37, 44)]
+    assert feature.background.line_range == (12, 16)
+    assert not any(x.loaded for x in feature.scenario_list)
+
+@lazy.test
+def steps_are_loaded_on_demand():
+    indexed, parsed = parse_both("complex")
+    scenario = indexed[0].scenario_list[1]
+    assert [x.name for x in scenario.tags] == ["tag3"]
+    assert scenario.steps[0].table == parsed[0].scenario_list[1].steps[0].table
+    assert scenario.loaded
+    assert not indexed[0].scenario_list[0].loaded
+    blocks = [indexed[0].background] + indexed[0].scenario_list
+    expected = [parsed[0].background] + parsed[0].scenario_list
+    assert [signature(x) for x in blocks] == [signature(x) for x in expected]
+
+@lazy.test
+def multiline_is_not_read_as_headers():
+    indexed = Parser().parse_index([
+        "Feature: Multiline",
+        "  Scenario: Docs",
+        "    Given a document",
+        '      """',
+        "      Scenario: not a scenario",
+        '      """',
+    ])
+    scenario_list = indexed[0].scenario_list
+    assert [x.name for x in scenario_list] == ["Docs"]
+    assert scenario_list[0].steps[0].multiline == "Scenario: not a scenario"
+
+@lazy.test
+def quotes_not_after_a_step_are_not_multiline():
+    for lines in (["Feature: Quotes", "  Scenario: A", '    """',
+                   "  Scenario: B", "    Given b"],
+                  ["Feature: Quotes", "  Scenario: A", "    Given a",
+                   "      | x |", '    """', "  Scenario: B"],
+                  ["Feature: Quotes", "  Scenario: A", "    Given a",
+                   "    some text", '    """', "  Scenario: not B",
+                   '    """', "  Scenario: B"]):
+        indexed = Parser().parse_index(lines)[0]
+        parsed = Parser().parse(lines)[0]
+        assert [x.name for x in indexed.scenario_list] ==\
+            [x.name for x in parsed.scenario_list]
+        assert indexed.scenario_list[-1].name == "B"
+
+@lazy.test
+def lazy_outline_loads_examples():
+    with open(get_feature("outline")) as handle:
+        outline = Parser().parse_index(handle)[0].scenario_list[0]
+    assert not outline.loaded
+    assert [x.name for x in outline.examples] == ["small", "big"]
+    assert outline.loaded
+    assert len(list(outline.expand())) == 3
+
+@lazy.test
+def body_comments_do_not_switch_language():
+    lines = ["Feature: Comments", "  Scenario: A", "    # language: de",
+             "    Given a step", "    Then done"]
+    indexed = Parser().parse_index(lines)[0]
+    parsed = Parser().parse(lines)[0]
+    assert [x.name for x in indexed.scenario_list[0].steps] ==\
+        [x.name for x in parsed.scenario_list[0].steps] == ["a step", "done"]
+    lines[2] = "    # language: unknown"
+    indexed = Parser().parse_index(lines)[0]
+    assert len(indexed.scenario_list[0].steps) == 2
+
+@lazy.test
+def description_ends_at_the_first_step():
+    for lines in (["Feature: F", "  Given stray", "  more text"],
+                  ["Feature: F", "  some text", "  | x |", "  more text",
+                   "  Scenario: A"]):
+        indexed = Parser().parse_index(lines)[0]
+        parsed = Parser().parse(lines)[0]
+        assert indexed.description == parsed.description
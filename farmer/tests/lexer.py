@@ -1,5 +1,9 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
 from attest import Tests
-from farmer.lexer import Lexer
+from farmer.language import LANGUAGE, Languages
+from farmer.lexer import Lexer, KeywordMatcher
 from .test_helper import get_feature
 try:
     from cStringIO import StringIO
@@ -172,3 +176,190 @@ def complex_feature():
         ]
         for index , item in enumerate(tokens):
             assert tokens[index] == expected[index]
+
+@lexer.test
+def keyword_matcher_is_cached_per_language():
+    assert KeywordMatcher.for_language("en") is KeywordMatcher.for_language("en")
+    matcher = KeywordMatcher.for_language("en")
+    assert matcher.match("Scenario Outline: Eating") == ("scenario_outline",
+                                                         "Eating")
+    assert matcher.match("Scenario: Eating") == ("scenario", "Eating")
+    assert matcher.match("But not this") == ("step", "not this")
+    assert matcher.match("nothing to see") is None
+
+@lexer.test
+def step_mentioning_a_tag_is_still_a_step():
+    lex = Lexer()
+    feature = StringIO("Given I mail @bob")
+    tokens = lex.tokenize(feature)
+    expected = [("step", "I mail @bob", 0)]
+    assert tokens == expected
+
+@lexer.test
+def iter_tokens_matches_tokenize():
+    with open(get_feature("complex")) as feature:
+        expected = Lexer().tokenize(feature)
+    with open(get_feature("complex")) as feature:
+        assert list(Lexer().iter_tokens(feature)) == expected
+
+@lexer.test
+def iter_tokens_reads_source_lazily():
+    consumed = []
+    def source():
+        for line in ["Feature: Lazy", "Scenario: First", "Given a step"]:
+            consumed.append(line)
+            yield line
+    tokens = Lexer().iter_tokens(source())
+    assert next(tokens) == ("feature", "Lazy", 0)
+    assert len(consumed) == 1
+
+@lexer.test
+def language_header_only_in_leading_comments():
+    lex = Lexer()
+    feature = StringIO("Feature: Testing\n# language: xx\n")
+    tokens = lex.tokenize(feature)
+    assert lex.lang == "en"
+    assert tokens == [("feature", "Testing", 0)]
+
+@lexer.test
+def unknown_language_raises():
+    lex = Lexer()
+    try:
+        lex.tokenize(StringIO("# language: xx\nFeature: Testing\n"))
+    except KeyError:
+        pass
+    else:
+        assert False, "KeyError not raised"
+
+def mapped_tokens(content):
+    """Tokenize content, a byte string, from a memory mapped file"""
+    handle, path = tempfile.mkstemp(suffix=".feature")
+    try:
+        os.write(handle, content)
+        os.close(handle)
+        lex = Lexer()
+        return lex, lex.tokenize_file(path)
+    finally:
+        os.remove(path)
+
+@lexer.test
+def mapped_file_matches_tokenize():
+    for name in ["simple", "simple_with_comments", "simple_with_multiline",
+                 "simple_with_feature_description", "complex", "outline",
+                 "language"]:
+        with open(get_feature(name)) as feature:
+            expected = Lexer().tokenize(feature)
+        assert Lexer().tokenize_file(get_feature(name)) == expected, name
+
+@lexer.test
+def mapped_file_skips_blank_lines_and_comments():
+    lex, tokens = mapped_tokens(b"\xef\xbb\xbf# language: en\r\n\r\n"
+                                b"Feature: Mapped \r\n  # comment\r\n"
+                                b"\t\r\n  Scenario: Bytes\r\n"
+                                b"    Given a caf\xc3\xa9  \r\n"
+                                b"    # Given a comment")
+    assert lex.lang == "en"
+    assert tokens == [("feature", "Mapped", 2),
+                      ("scenario", "Bytes", 5),
+                      ("step", u"a caf\xe9", 6)]
+
+@lexer.test
+def mapped_empty_file_has_no_tokens():
+    assert mapped_tokens(b"")[1] == []
+    assert mapped_tokens(b"\n# comment only\n")[1] == []
+
+@lexer.test
+def languages_are_loaded_on_first_use():
+    languages = Languages(LANGUAGE.directory)
+    assert not languages._loaded
+    assert "de" in languages.codes() and "ja" in languages.codes()
+    assert languages["de"]["feature"] == [u"Funktionalit\xe4t", "Funktion"]
+    assert list(languages._loaded) == ["de"]
+    assert "xx" not in languages and "../de" not in languages
+
+@lexer.test
+def german_feature():
+    lex = Lexer()
+    tokens = lex.tokenize(StringIO(u"# language: de\n"
+                                   u"Funktionalit\xe4t: Sprachen\n"
+                                   u"  Grundlage:\n"
+                                   u"    Angenommen ein Schritt\n"
+                                   u"  Szenariogrundriss: Umriss\n"
+                                   u"    Gegeben seien <n> Schritte\n"
+                                   u"    Beispiele:\n"
+                                   u"      | n |\n"))
+    assert lex.lang == "de"
+    assert tokens == [("feature", "Sprachen", 1),
+                      ("background", "", 2),
+                      ("step", "ein Schritt", 3),
+                      ("scenario_outline", "Umriss", 4),
+                      ("step", "<n> Schritte", 5),
+                      ("examples", "", 6),
+                      ("row", "| n |", 7)]
+
+@lexer.test
+def japanese_steps_need_no_space():
+    lex = Lexer()
+    elements = list(lex.iter_elements([u"# language: ja",
+                                       u"機能: 言語",
+                                       u"シナリオ: 例",
+                                       u"前提テスト",
+                                       u"* ステップ"]))
+    assert [x[2] for x in elements] == ["feature", "scenario", "step",
+                                        "step"]
+    assert elements[2][:2] == (u"前提", u"テスト")
+    assert elements[3][:2] == ("*", u"ステップ")
+
+@lexer.test
+def longest_keyword_wins():
+    lex = Lexer()
+    elements = list(lex.iter_elements([u"# language: fr",
+                                       u"Fonctionnalit\xe9: Mots",
+                                       u"Sc\xe9nario: Cl\xe9s",
+                                       u"Etant donn\xe9es des cl\xe9s",
+                                       u"Lorsqu'il pleut"]))
+    assert elements[2][:2] == (u"Etant donn\xe9es", u"des cl\xe9s")
+    assert elements[3][:2] == (u"Lorsqu'", u"il pleut")
+
+@lexer.test
+def step_keyword_needs_a_word_boundary():
+    tokens = Lexer().tokenize(["Feature: Words", "Scenario: Boundaries",
+                               "Given a step", "Android is not a step"])
+    assert [x[0] for x in tokens] == ["feature", "scenario", "step"]
+
+def fed_tokens(lex, content, size):
+    tokens = []
+    for start in range(0, len(content), size):
+        tokens.extend(lex.feed(content[start:start + size]))
+    return tokens + lex.close()
+
+@lexer.test
+def feed_chunks_matches_tokenize():
+    with open(get_feature("complex"), "rb") as feature:
+        content = feature.read()
+    expected = Lexer().tokenize(content.decode("utf-8").splitlines())
+    lex = Lexer()
+    for size in (1, 2, 7, 64, len(content)):
+        assert fed_tokens(lex, content, size) == expected
+        assert fed_tokens(lex, content.decode("utf-8"), size) == expected
+
+@lexer.test
+def feed_emits_tokens_once_final():
+    lex = Lexer()
+    assert lex.feed(b"Feature: Push\n  Scen") == [("feature", "Push", 0)]
+    assert lex.feed(b"ario: Chunks\n  Given a st") == [
+        ("scenario", "Chunks", 1)]
+    assert lex.feed(b'ep\n  """\n  text\n') == [("step", "a step", 2)]
+    assert lex.feed(b'  """\n') == [("multiline", "text", 3)]
+    assert lex.close() == []
+
+@lexer.test
+def feed_splits_multibyte_characters():
+    content = u"# language: fr\nFonctionnalit\xe9: \xe9t\xe9".encode("utf-8")
+    lex = Lexer()
+    tokens = fed_tokens(lex, content, 1)
+    assert lex.lang == "fr"
+    assert tokens == [("feature", u"\xe9t\xe9", 1)]
+    lex.start_feed(elements=True)
+    lex.feed(b"Feature: Elements\r\n  Scenario: CRLF\r")
+    assert lex.close() == [("Scenario", "CRLF", "scenario", 1)]
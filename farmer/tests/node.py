@@ -0,0 +1,122 @@
+import pickle
+from attest import Tests
+from farmer.node import DataTable, EMPTY, Feature, Scenario, Step, Tag
+from farmer.parser import Parser
+from .test_helper import get_feature
+
+node = Tests()
+
+@node.test
+def nodes_have_no_instance_dict():
+    for instance in [Feature("Feature", "Testing", "feature"),
+                     Scenario("Scenario", "Testing", "scenario"),
+                     Step("Given", "I have test", "step"),
+                     Tag("Tag", "wip", "tag")]:
+        assert not hasattr(instance, "__dict__")
+
+@node.test
+def empty_tags_and_steps_are_shared():
+    first = Scenario("Scenario", "First", "scenario")
+    second = Scenario("Scenario", "Second", "scenario")
+    assert first.tags is second.tags is EMPTY
+    assert first.steps is second.steps is EMPTY
+    first.add_step(Step("Given", "I have test", "step"))
+    first.add_tag(Tag("Tag", "wip", "tag"))
+    assert len(first.steps) == len(first.tags) == 1
+    assert second.steps is second.tags is EMPTY
+
+@node.test
+def keywords_are_interned():
+    keyword = "".join(["Giv", "en"])
+    first = Step(keyword, "I have test", "step")
+    second = Step("Given", "I run it", "step")
+    assert first.keyword is second.keyword
+
+@node.test
+def nodes_are_picklable():
+    feature = Feature("Feature", "Testing", "feature")
+    feature.scenario_list.append(Scenario("Scenario", "Hello", "scenario"))
+    copy = pickle.loads(pickle.dumps(feature, pickle.HIGHEST_PROTOCOL))
+    assert copy.name == "Testing"
+    assert copy.scenario_list[0].name == "Hello"
+    assert copy.tags == EMPTY
+
+@node.test
+def data_table_is_stored_by_column():
+    step = Step("Given", "users", "step")
+    for row in ["| name | age |", "| ann | 31 |", "| bob | 42 |",
+                "| c\\|d | 7 |"]:
+        step.add_row(row)
+    table = step.table
+    assert table.header == ("name", "age")
+    assert len(table) == 3
+    assert table.columns == [["ann", "bob", "c|d"], ["31", "42", "7"]]
+    assert table.column("age") is table.columns[1]
+    assert table.to_columns() == table.columns
+    assert table.to_columns()[0] is not table.columns[0]
+    assert list(table.rows())[1] == ("bob", "42")
+
+@node.test
+def data_table_rows_are_views():
+    table = DataTable.from_rows(("name", "age"), [("ann", "31"),
+                                                  ("bob", "42")])
+    row = table[-1]
+    assert row["name"] == "bob" and row[1] == "42"
+    assert row == ("bob", "42")
+    assert row.as_dict() == {"name": "bob", "age": "42"}
+    assert not hasattr(row, "__dict__")
+    table.columns[0][1] = "bo"
+    assert row["name"] == "bo"
+    named = list(table.named_rows())
+    assert named[0].name == "ann" and named[1].age == "42"
+
+@node.test
+def ragged_rows_are_padded():
+    table = DataTable()
+    table.add_row("|a|b|")
+    table.add_row("|1|")
+    table.add_row("|2|3|4|")
+    assert table.header == ("a", "b", "")
+    assert table.to_rows()[1:] == [("1", "", ""), ("2", "3", "4")]
+    assert [x._2 for x in table.named_rows()] == ["", "4"]
+
+@node.test
+def data_tables_are_picklable():
+    table = DataTable.from_rows(("a", "b"), [("1", "2")])
+    list(table.named_rows())
+    copy = pickle.loads(pickle.dumps(table, pickle.HIGHEST_PROTOCOL))
+    assert copy == table
+    assert list(copy.named_rows())[0].b == "2"
+
+@node.test
+def scenarios_inherit_background_steps_and_feature_tags():
+    with open(get_feature("complex")) as handle:
+        feature = Parser().parse(handle)[0]
+    first, second = feature.scenario_list[:2]
+    background = feature.background.steps
+    assert first.feature is feature
+    assert first.effective_steps[:2] == background
+    assert first.effective_steps[2:] == first.steps
+    # computed once, and sharing the step objects
+    assert first.effective_steps is first.effective_steps
+    assert second.effective_steps[0] is background[0]
+    assert [tag.name for tag in first.effective_tags] == [
+        "tag1", "tag2", "tag3", "tag4"]
+    assert feature.flatten() is feature.scenario_list
+    assert second.effective_tags[0] is feature.tags[0]
+    lone = Scenario("Scenario", "Alone", "scenario")
+    assert lone.effective_steps is lone.steps is EMPTY
+    assert lone.effective_tags is EMPTY
+
+@node.test
+def expanded_outlines_inherit_from_the_feature():
+    feature = Parser().parse([u"@shop\n", u"Feature: x\n",
+                              u"  Background:\n", u"    Given a shop\n",
+                              u"  Scenario Outline: y\n",
+                              u"    When I buy <n>\n", u"  Examples:\n",
+                              u"    | n |\n", u"    | 1 |\n"])[0]
+    outline = feature.scenario_list[0]
+    expanded = list(outline.expand())[0]
+    assert [step.name for step in expanded.effective_steps] == [
+        "a shop", "I buy 1"]
+    assert [tag.name for tag in expanded.effective_tags] == ["shop"]
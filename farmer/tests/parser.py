@@ -2,6 +2,7 @@ from attest import Tests
 from farmer.lexer import Lexer
 from farmer.parser import Parser
 from farmer.node import Feature, Tag
+from .test_helper import get_feature
 
 parser = Tests()
 
@@ -188,3 +189,90 @@ def multiple_feature_is_ok():
     assert set([x.name for x in feature_list[0].tags]) <= set(["wip", "test"])
     assert set([x.name for x in feature_list[1].scenario_list[0].tags])\
             <= set(["javascript", "later"])
+
+@parser.test
+def parse_source_with_lexer():
+    parse = Parser()
+    with open(get_feature("simple")) as handle:
+        feature_list = parse.parse(handle)
+    assert len(feature_list) == 1
+    step = feature_list[0].scenario_list[0].steps[0]
+    assert step.keyword == "Given"
+    assert step.name == "there is a step"
+    assert step.key_type == "step"
+
+@parser.test
+def build_keeps_source_order_and_attaches_children():
+    parse = Parser()
+    with open(get_feature("complex")) as handle:
+        feature = parse.parse(handle)[0]
+    assert [x.name for x in feature.tags] == ["tag1", "tag2"]
+    assert [x.name for x in feature.background.steps] ==\
+            ["this is a background step", "this is another one"]
+    assert [x.name for x in feature.scenario_list] ==\
+            ["Reading a Scenario", "Reading a second scenario", "Hammerzeit"]
+    assert [x.name for x in feature.scenario_list[0].tags] == ["tag3", "tag4"]
+    steps = feature.scenario_list[1].steps
+    assert steps[0].table.to_rows() == [("a", "b"), ("c", "d"), ("e", "f")]
+    assert len(steps[1].table) == 3
+    assert steps[2].table == ()
+    assert feature.scenario_list[2].steps[0].multiline ==\
+            "Makes Homer something something\nAnd something else"
+
+@parser.test
+def tag_before_description_does_not_hang():
+    parse = Parser()
+    feature_list = parse.parse_lex([
+        ("Feature", "Testing", 'feature'),
+        ("Tag", "wip", 'tag'),
+        ("Feature Description", "Feature Description", "feature_description"),
+        ("Scenario", "Hello World", "scenario"),
+    ])
+    assert [x.name for x in feature_list[0].scenario_list[0].tags] == ["wip"]
+
+@parser.test
+def scenario_outline_has_examples():
+    parse = Parser()
+    with open(get_feature("outline")) as handle:
+        outline = parse.parse(handle)[0].scenario_list[0]
+    assert outline.key_type == "scenario_outline"
+    assert len(outline.steps) == 3
+    assert outline.steps[1].table.to_rows() == [("eaten", "left"),
+                                                ("<eat>", "<left>")]
+    assert [x.name for x in outline.examples] == ["small", "big"]
+    assert [x.name for x in outline.examples[1].tags] == ["big"]
+    assert outline.examples[0].header == ("start", "eat", "left")
+    assert list(outline.examples[0].rows()) == [("12", "5", "7"),
+                                                ("20", "5", "15")]
+
+@parser.test
+def expand_scenario_outline():
+    parse = Parser()
+    with open(get_feature("outline")) as handle:
+        outline = parse.parse(handle)[0].scenario_list[0]
+    scenarios = outline.expand()
+    first = next(scenarios)
+    assert first.name == "eating 12 cucumbers"
+    assert first.key_type == "scenario"
+    assert [x.name for x in first.steps] == ["there are 12 cucumbers",
+                                             "I eat 5 cucumbers",
+                                             "I should have 7 cucumbers"]
+    assert first.steps[1].table.to_rows() == [("eaten", "left"), ("5", "7")]
+    rest = list(scenarios)
+    assert [x.name for x in rest] == ["eating 20 cucumbers",
+                                      "eating 100 cucumbers"]
+    assert [x.name for x in rest[1].tags] == ["big"]
+
+@parser.test
+def unknown_placeholders_are_kept():
+    parse = Parser()
+    feature = parse.parse([
+        "Feature: Placeholders",
+        "  Scenario Outline: keep",
+        "    Given <known> and <unknown> at 100%",
+        "    Examples:",
+        "      | known |",
+        "      | yes |",
+    ])[0]
+    scenario = next(feature.scenario_list[0].expand())
+    assert scenario.steps[0].name == "yes and <unknown> at 100%"
@@ -0,0 +1,99 @@
+from attest import Tests
+from farmer.node import Feature, Scenario, Step, Tag
+from farmer.parser import Parser
+from farmer.serialize import FormatError, dumps, loads
+from .test_helper import get_feature
+
+serialize = Tests()
+
+def parse(name):
+    with open(get_feature(name)) as handle:
+        return Parser().parse(handle)
+
+def describe(features):
+    """Everything about features, as plain data"""
+    def definition(node):
+        return (node.keyword, node.name, node.key_type, node.line)
+    def table(table):
+        return table and table.to_rows()
+    def container(node):
+        return (definition(node), [definition(x) for x in node.tags],
+                [(definition(x), x.multiline, table(x.table))
+                 for x in node.steps],
+                [(definition(x), [definition(t) for t in x.tags],
+                  table(x.table)) for x in getattr(node, "examples", ())])
+    return [(definition(feature), [definition(x) for x in feature.tags],
+             feature.description,
+             feature.background and container(feature.background),
+             [container(x) for x in feature.scenario_list])
+            for feature in features]
+
+@serialize.test
+def round_trip():
+    for name in ["simple", "simple_with_multiline", "complex", "outline",
+                 "simple_with_feature_description"]:
+        features = parse(name)
+        data = dumps(features)
+        loaded = loads(data)
+        assert describe(loaded) == describe(features), name
+        assert dumps(loaded) == data
+
+@serialize.test
+def strings_are_stored_once():
+    features = parse("outline")
+    data = dumps(features)
+    # the outline name and three steps, each once
+    assert data.count(b"cucumbers") == 4
+    with open(get_feature("outline"), "rb") as handle:
+        assert len(data) < len(handle.read())
+
+@serialize.test
+def headers_only():
+    features = parse("complex")
+    headers = loads(dumps(features), headers_only=True)
+    feature = headers[0]
+    assert feature.name == features[0].name
+    assert [x.name for x in feature.tags] == ["tag1", "tag2"]
+    assert [(x.name, x.line) for x in feature.scenario_list] ==\
+            [(x.name, x.line) for x in features[0].scenario_list]
+    assert [x.name for x in feature.scenario_list[0].tags] == ["tag3", "tag4"]
+    assert feature.background.steps == ()
+    assert all(x.steps == () for x in feature.scenario_list)
+    # the last scenario runs to the end, its steps can not be cut short
+    try:
+        loads(dumps(features)[:-3], headers_only=True)
+    except FormatError:
+        pass
+    else:
+        assert False, "FormatError not raised"
+
+@serialize.test
+def nodes_built_by_hand():
+    feature = Feature("Feature", u"Unicod\xe9", "feature")
+    scenario = Scenario("Scenario", "", "scenario")
+    scenario.add_step(Step("Given", "no line", "step"))
+    scenario.add_tag(Tag("Tag", "wip", "tag"))
+    feature.scenario_list.append(scenario)
+    loaded = loads(dumps([feature]))[0]
+    assert loaded.name == u"Unicod\xe9" and loaded.line is None
+    assert loaded.scenario_list[0].name == ""
+    assert loaded.scenario_list[0].steps[0].line is None
+    assert loads(dumps([])) == []
+
+@serialize.test
+def bad_data_raises_format_error():
+    data = dumps(parse("complex"))
+    for bad in [b"", b"PK\x03\x04", data[:4] + b"\x09" + data[5:],
+                data[:len(data) // 2]]:
+        try:
+            loads(bad)
+        except FormatError:
+            pass
+        else:
+            assert False, "FormatError not raised for %r" % bad[:8]
+    try:
+        dumps([Feature("Feature", u"nul\x00", "feature")])
+    except FormatError:
+        pass
+    else:
+        assert False, "FormatError not raised"
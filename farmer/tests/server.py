@@ -0,0 +1,151 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from attest import Tests
+from farmer.server import RequestError, Server, Suite, request, wait_for
+
+server = Tests()
+
+LOGIN = u"""\
+@web
+Feature: Login
+  Background:
+    Given a user
+
+  @smoke
+  Scenario: log in
+    When I log in
+    Then I see my page
+
+  Scenario: log out
+    When I log out
+"""
+
+def write(directory, name, text, age=0):
+    path = os.path.join(directory, name)
+    with open(path, "w") as handle:
+        handle.write(text)
+    # the modification time alone tells changes apart, however fast
+    # the writes follow each other
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + age))
+    return path
+
+@server.test
+def suite_follows_the_files():
+    directory = tempfile.mkdtemp()
+    try:
+        login = write(directory, "login.feature", LOGIN)
+        suite = Suite(directory, workers=1)
+        assert suite.scan() == ([login], [])
+        assert suite.status() == {"files": 1, "errors": 0, "scenarios": 2}
+        assert [s["name"] for s in suite.scenarios("@smoke")] == ["log in"]
+        assert suite.scenarios("@web")[1]["tags"] == ["web"]
+        assert suite.scan() == ([], [])
+
+        write(directory, "login.feature", LOGIN.replace("@smoke", "@wip"),
+              age=10)
+        broken = os.path.join(directory, "broken.feature")
+        with open(broken, "wb") as handle:
+            handle.write(b"Feature: \xff\n")
+        changed, removed = suite.scan()
+        assert sorted(changed) == [broken, login] and removed == []
+        assert suite.scenarios("@smoke") == []
+        assert [f["path"] for f in suite.files() if f["error"]] == [broken]
+
+        os.remove(broken)
+        os.remove(login)
+        assert sorted(suite.scan()[1]) == sorted([broken, login])
+        assert suite.status()["scenarios"] == 0
+    finally:
+        shutil.rmtree(directory)
+
+@server.test
+def steps_include_the_background():
+    directory = tempfile.mkdtemp()
+    try:
+        login = write(directory, "login.feature", LOGIN)
+        suite = Suite([login], workers=1)
+        suite.scan()
+        scenario = suite.steps(login, 7)
+        assert scenario["name"] == "log in"
+        assert [(step["name"], step["line"]) for step in scenario["steps"]]\
+            == [("a user", 4), ("I log in", 8), ("I see my page", 9)]
+        try:
+            suite.steps(login, 1)
+        except RequestError:
+            pass
+        else:
+            assert False, "RequestError not raised"
+    finally:
+        shutil.rmtree(directory)
+
+@server.test
+def socket_requests():
+    directory = tempfile.mkdtemp()
+    try:
+        login = write(directory, "login.feature", LOGIN)
+        socket_path = os.path.join(directory, "farmer.sock")
+        suite = Suite(directory, workers=1)
+        suite.scan()
+        instance = Server(socket_path, suite)
+        thread = threading.Thread(target=instance.serve_forever)
+        thread.start()
+        try:
+            assert wait_for(socket_path)["scenarios"] == 2
+            result = request(socket_path, "scenarios", tags="not @smoke")
+            assert [(s["path"], s["line"]) for s in result] == [(login, 11)]
+            assert len(request(socket_path, "steps", path=login,
+                               line=11)["steps"]) == 2
+            for method, params in (("nothing", {}),
+                                   ("scenarios", {"tags": "@a and"}),
+                                   ("scenarios", {"tags": 123}),
+                                   ("steps", {"path": login})):
+                try:
+                    request(socket_path, method, **params)
+                except RequestError:
+                    pass
+                else:
+                    assert False, "RequestError not raised by %s" % method
+            assert "error" in instance.answer(b"[1]")
+            assert wait_for(socket_path)["scenarios"] == 2
+        finally:
+            instance.shutdown()
+            instance.server_close()
+            thread.join()
+        assert not os.path.exists(socket_path)
+    finally:
+        shutil.rmtree(directory)
+
+@server.test
+def only_stale_sockets_are_replaced():
+    directory = tempfile.mkdtemp()
+    try:
+        suite = Suite(directory, workers=1)
+        feature = write(directory, "login.feature", LOGIN)
+        try:
+            Server(feature, suite)
+        except OSError:
+            pass
+        else:
+            assert False, "a regular file was replaced"
+        assert os.path.isfile(feature)
+
+        socket_path = os.path.join(directory, "farmer.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+        live = Server(socket_path, suite)
+        try:
+            try:
+                Server(socket_path, suite)
+            except OSError:
+                pass
+            else:
+                assert False, "a live socket was replaced"
+        finally:
+            live.server_close()
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import tempfile
+from attest import Tests
+from farmer.parser import Parser
+from farmer.shard import Job, ShardPlanner, load_timings
+from .test_helper import get_feature
+
+shard = Tests()
+
+def planner_of(shards, *names, **kwargs):
+    planner = ShardPlanner(shards, **kwargs)
+    for name in names:
+        with open(get_feature(name)) as handle:
+            planner.add(name, Parser().parse(handle))
+    return planner
+
+@shard.test
+def estimates():
+    planner = planner_of(1, "outline", "complex")
+    outline = planner.jobs[0]
+    assert outline.id == "outline:2"
+    # three example rows of three steps, one of them with two table rows
+    assert round(outline.estimate, 6) == round(3 * (1 + 3 + 0.2), 6)
+    costs = [round(job.estimate, 6) for job in planner.jobs[1:]]
+    # complex.feature has a background of two steps
+    assert costs == [1 + 2 + 2, 1 + 2 + 4 + 0.7, 1 + 2 + 2]
+
+@shard.test
+def longest_first_on_the_least_loaded_shard():
+    planner = ShardPlanner(2)
+    planner.jobs = [Job("path", None, cost) for cost in (1, 3, 2, 3, 2, 1)]
+    shards = planner.plan()
+    assert [shard.cost for shard in shards] == [6, 6]
+    assert [len(shard) for shard in shards] == [3, 3]
+    # jobs stay in the order they were added
+    assert [job.estimate for job in shards[0].jobs] == [1, 3, 2]
+
+@shard.test
+def timings_replace_estimates():
+    timings = {"complex:18": 10.0, "complex:38": 20.0}
+    planner = planner_of(2, "complex", timings=timings)
+    cost = planner.cost_function()
+    first, second, third = planner.jobs
+    assert (cost(first), cost(third)) == (10.0, 20.0)
+    # 30 seconds for an estimate of 10: three seconds per unit
+    assert round(cost(second), 6) == 3 * 7.7
+    shards = planner.plan()
+    assert [len(shard) for shard in shards] == [1, 2]
+    assert shards[0].jobs == [second]
+
+@shard.test
+def write_manifests():
+    directory = tempfile.mkdtemp()
+    try:
+        assert load_timings(os.path.join(directory, "missing.json")) == {}
+        timings_path = os.path.join(directory, "timings.json")
+        with open(timings_path, "w") as handle:
+            json.dump({"complex:18": 3}, handle)
+        assert load_timings(timings_path) == {"complex:18": 3.0}
+        planner = planner_of(2, "outline", "complex")
+        paths = planner.write(planner.plan(), os.path.join(directory, "out"))
+        assert [os.path.basename(path) for path in paths] == [
+            "shard-0.json", "shard-1.json"]
+        manifests = []
+        for path in paths:
+            with open(path) as handle:
+                manifests.append(json.load(handle))
+        assert manifests[0]["shards"] == 2
+        ids = sorted(scenario["id"] for manifest in manifests
+                     for scenario in manifest["scenarios"])
+        assert ids == ["complex:18", "complex:23", "complex:38",
+                       "outline:2"]
+        assert manifests[0]["scenarios"][0]["name"] ==\
+            "eating <start> cucumbers"
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,80 @@
+import json
+from attest import Tests
+from farmer.lexer import Lexer
+from farmer.parser import Parser
+from farmer.stats import Stats
+from .test_helper import get_feature
+
+stats = Tests()
+
+@stats.test
+def disabled_by_default():
+    lexer = Lexer()
+    assert lexer.stats is None
+    assert "scan_line" not in vars(lexer)
+    assert Parser().stats is None
+
+@stats.test
+def lexer_counts_lines_and_tokens():
+    collected = Stats()
+    with open(get_feature("complex")) as handle:
+        tokens = Lexer(stats=collected).tokenize(handle)
+    assert collected.counter("lexer_lines_total") == 32
+    assert sum(collected.counter("lexer_tokens_total", type=token_type)
+               for token_type in set(x[0] for x in tokens)) == len(tokens)
+    assert collected.counter("lexer_tokens_total", type="step") ==\
+            len([x for x in tokens if x[0] == "step"])
+    assert collected.counter("lexer_regex_matches_total", result="hit") ==\
+            len([x for x in tokens if x[0] not in ("tag", "row",
+                                                   "multiline",
+                                                   "feature_description")])
+    assert collected.timing("phase_seconds", phase="tokenize")[0] == 1
+    assert collected.timing("lexer_scan_seconds", type="row")[0] == 7
+
+@stats.test
+def parser_times_every_phase():
+    collected = Stats()
+    with open(get_feature("complex")) as handle:
+        Parser(stats=collected).parse(handle)
+    for phase in ("lex", "segment", "build"):
+        count, total, longest = collected.timing("phase_seconds", phase=phase)
+        assert count == 1 and total >= longest >= 0
+    assert collected.timing("build_feature_seconds")[0] == 1
+    assert collected.counter("parser_features_total") == 1
+    assert collected.counter("parser_elements_total", type="scenario") == 3
+    assert collected.counter("parser_steps_total") == 10
+
+@stats.test
+def callback_sees_every_record():
+    records = []
+    collected = Stats(callback=lambda *record: records.append(record))
+    Parser(stats=collected).parse(["Feature: Called", "Scenario: Back",
+                                   "Given a step"])
+    assert ("count", "lexer_tokens_total", (("type", "step"),), 1) in records
+    assert len([x for x in records if x[0] == "time"]) ==\
+            sum(count for count, total, longest
+                in collected.timings.values())
+
+@stats.test
+def export_formats():
+    collected = Stats()
+    collected.count("lexer_tokens_total", 3, (("type", 'a"b'),))
+    collected.observe("phase_seconds", 0.5, (("phase", "lex"),))
+    collected.observe("phase_seconds", 1.5, (("phase", "lex"),))
+    data = json.loads(collected.to_json())
+    assert data["counters"] == [{"name": "lexer_tokens_total",
+                                 "labels": {"type": 'a"b'}, "value": 3}]
+    assert data["timings"][0]["seconds"] == 2.0
+    assert data["timings"][0]["max"] == 1.5
+    assert collected.to_prometheus().splitlines() == [
+        "# TYPE farmer_lexer_tokens_total counter",
+        'farmer_lexer_tokens_total{type="a\\"b"} 3',
+        "# TYPE farmer_phase_seconds summary",
+        'farmer_phase_seconds_sum{phase="lex"} 2.0',
+        'farmer_phase_seconds_count{phase="lex"} 2',
+    ]
+    other = Stats()
+    other.merge(collected)
+    other.merge(collected)
+    assert other.counter("lexer_tokens_total", type='a"b') == 6
+    assert other.timing("phase_seconds", phase="lex") == (4, 4.0, 1.5)
@@ -0,0 +1,89 @@
+import re
+from attest import Tests
+from farmer.parser import Parser
+from farmer.steps import (StepDefinitions, StepIndex, has_alternation,
+                          literal_prefix, normalize)
+from .test_helper import get_feature
+
+steps = Tests()
+
+def index_of(*names, **kwargs):
+    index = StepIndex(**kwargs)
+    for name in names:
+        with open(get_feature(name)) as handle:
+            index.add(name, Parser().parse(handle))
+    return index
+
+@steps.test
+def literal_prefixes():
+    assert literal_prefix(r"^I have (\d+) cucumbers$") == "I have "
+    assert literal_prefix(r"\AI pay\.$") == "I pay."
+    assert literal_prefix(r"^I pay\d+") == "I pay"
+    assert literal_prefix(r"^I have cukes?") == "I have cuke"
+    assert literal_prefix(r"^I have\ it") == "I have it"
+    assert literal_prefix(r"I have it") is None
+    assert literal_prefix(r"^I have|you have") is None
+    assert literal_prefix(r"^I (?:have|had) it") == "I "
+    assert not has_alternation(r"^I [|] (a|b) \|")
+    assert not has_alternation(r"^I []|] x") and has_alternation(r"^a[^]]|b")
+
+@steps.test
+def steps_are_normalized_and_deduplicated():
+    index = index_of("outline", "complex")
+    assert normalize("  a \t step  ") == "a step"
+    # three example rows of three steps, and the ten steps of complex
+    assert index.count == 3 * 3 + 10
+    assert "I eat 5 cucumbers" in index
+    assert len(index.occurrences("I eat  5 cucumbers")) == 2
+    assert index.duplicates()[0][0] == "I eat 5 cucumbers"
+    assert [x.path for x in index.occurrences("this is a background step")]\
+            == ["complex"]
+
+@steps.test
+def outlines_without_expansion():
+    index = index_of("outline", expand_outlines=False)
+    assert index.texts() == ["I eat <eat> cucumbers",
+                             "I should have <left> cucumbers",
+                             "there are <start> cucumbers"]
+
+@steps.test
+def remove_and_update_paths():
+    index = index_of("outline", "complex")
+    count = index.count
+    index.remove("outline")
+    assert "I eat 5 cucumbers" not in index
+    assert index.count == count - 3 * 3
+    with open(get_feature("complex")) as handle:
+        index.update("complex", Parser().parse(handle))
+    assert index.count == count - 3 * 3
+    assert index.paths.keys() == set(["complex"])
+
+@steps.test
+def match_against_definitions():
+    index = index_of("outline")
+    patterns = [r"^there are (\d+) cucumbers$",
+                r"^I eat (\d+) cucumbers$",
+                re.compile(r"^i SHOULD have (\d+) cucumbers$", re.I),
+                r"(\d+) cucumbers$",
+                r"^I eat 5"]
+    matches = index.match(patterns)
+    assert len(matches) == len(index)
+    assert [x[0] for x in matches["there are 12 cucumbers"]] == [0, 3]
+    assert [x[0] for x in matches["I eat 5 cucumbers"]] == [1, 3, 4]
+    assert matches["I should have 99 cucumbers"][0][1].group(1) == "99"
+    assert index.undefined(patterns[:2]) == [
+        "I should have 15 cucumbers", "I should have 7 cucumbers",
+        "I should have 99 cucumbers"]
+
+@steps.test
+def definitions_agree_with_trying_each_regex():
+    patterns = [r"^a b (\w+)$", r"^a b c", r"^a", r"^a bc", r"^b (.*)",
+                r"c$", r"(?P<x>a) (?P=x)", r"^(?:a|b) c", r"^\(a\) b",
+                r"^a b c d e$", r"^ab?c"]
+    definitions = StepDefinitions(patterns)
+    compiled = [re.compile(pattern) for pattern in patterns]
+    for text in ["a b c", "a bc", "b c", "a a", "(a) b", "a b c d e", "ac",
+                 "abc", "x", "a b"]:
+        expected = [i for i, regex in enumerate(compiled)
+                    if regex.search(text)]
+        assert [i for i, match in definitions.match(text)] == expected, text
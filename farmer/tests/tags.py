@@ -0,0 +1,59 @@
+from attest import Tests
+from farmer.node import Feature, Scenario, Tag
+from farmer.tags import TagExpression, TagExpressionError, TagIndex
+
+tags = Tests()
+
+def feature(feature_tags, *scenarios):
+    instance = Feature("Feature", "Testing", "feature",
+                       [Tag("Tag", name, "tag") for name in feature_tags])
+    for name, scenario_tags in scenarios:
+        instance.scenario_list.append(Scenario(
+            "Scenario", name, "scenario",
+            tags=[Tag("Tag", tag, "tag") for tag in scenario_tags]))
+    return instance
+
+def build_index():
+    index = TagIndex()
+    index.add("a.feature", [feature(["web"], ("login", ["smoke"]),
+                                    ("search", ["smoke", "slow"]),
+                                    ("export", ["wip"]))])
+    index.add("b.feature", [feature([], ("api", ["smoke"]),
+                                    ("batch", ["slow"]))])
+    return index
+
+def names(selected):
+    return [entry.scenario.name for entry in selected]
+
+@tags.test
+def select_by_expression():
+    index = build_index()
+    assert names(index.select("@smoke")) == ["login", "search", "api"]
+    assert names(index.select("@smoke and not @slow")) == ["login", "api"]
+    assert names(index.select("@web and (@wip or @slow)")) ==\
+            ["search", "export"]
+    assert names(index.select("not @smoke")) == ["export", "batch"]
+    assert names(index.select("@unknown")) == []
+    assert index.count("@slow or @wip") == 3
+
+@tags.test
+def reparsed_file_updates_index():
+    index = build_index()
+    index.update("a.feature", [feature([], ("login", ["slow"]))])
+    assert names(index.select("@smoke")) == ["api"]
+    assert names(index.select("@slow")) == ["batch", "login"]
+    assert "web" not in index.tags
+    index.remove("b.feature")
+    assert len(index) == 1
+    assert names(index.select("@slow")) == ["login"]
+    assert len(index.scenarios) == 1
+
+@tags.test
+def invalid_expressions():
+    for text in ["@a and", "(@a", "@a @b", "@a xor @b", "and"]:
+        try:
+            TagExpression(text)
+        except TagExpressionError:
+            pass
+        else:
+            assert False, text
@@ -0,0 +1,64 @@
+import io
+from attest import Tests
+from farmer.lexer import Lexer
+from farmer.parser import Parser
+from farmer.serialize import dumps
+from farmer.tokens import StringTable, TokenBuffer
+from .test_helper import get_feature
+
+tokens = Tests()
+
+@tokens.test
+def buffer_yields_the_elements():
+    with open(get_feature("complex")) as handle:
+        elements = list(Lexer().iter_elements(handle))
+    buffer = TokenBuffer(elements)
+    assert len(buffer) == len(elements)
+    assert list(buffer) == elements
+    assert buffer[0] == elements[0] and buffer[-1] == elements[-1]
+    assert list(buffer.tokens()) == [(key_type, value, line) for
+                                     keyword, value, key_type, line
+                                     in elements]
+    assert buffer.nbytes() == len(elements) * (1 + 3 * 4)
+
+@tokens.test
+def parser_takes_a_buffer():
+    for name in ("complex", "outline", "simple_with_multiline"):
+        with open(get_feature(name)) as handle:
+            expected = Parser().parse(handle)
+        buffer = TokenBuffer.from_path(get_feature(name))
+        assert dumps(Parser().parse_lex(buffer)) == dumps(expected)
+
+@tokens.test
+def lines_and_none():
+    buffer = TokenBuffer([("Feature", "x", "feature"),
+                          ("Feature Description", None,
+                           "feature_description", -1)])
+    assert list(buffer) == [("Feature", "x", "feature", None),
+                            ("Feature Description", None,
+                             "feature_description", -1)]
+    try:
+        buffer.append(("?", "x", "unknown", 1))
+    except ValueError:
+        pass
+    else:
+        assert False, "ValueError not raised"
+
+@tokens.test
+def shared_and_compacted_strings():
+    strings = StringTable()
+    sources = [u"Feature: a\n  Scenario: b\n    Given c\n",
+               u"Feature: a\n  Scenario: d\n    Given c\n"]
+    buffers = [TokenBuffer.from_source(io.StringIO(source), strings=strings)
+               for source in sources]
+    # None, the keywords and the values a, b, c and d
+    assert len(strings) == 1 + 3 + 4
+    expected = [list(buffer) for buffer in buffers]
+    strings.compact()
+    assert strings.strings is None
+    assert strings.text == u"FeatureaScenariobGivencd"
+    assert [list(buffer) for buffer in buffers] == expected
+    assert buffers[0][2] == ("Given", "c", "step", 2)
+    buffers.append(TokenBuffer.from_source(io.StringIO(sources[0]),
+                                           strings=strings))
+    assert len(strings) == 8 and list(buffers[2]) == expected[0]
@@ -0,0 +1,108 @@
+import glob
+import io
+import os
+import shutil
+import tempfile
+from attest import Tests
+from farmer.parser import Parser
+from farmer.serialize import dumps
+from farmer.validate import ParseError, Validator, lint_paths
+from .test_helper import get_feature
+
+validate = Tests()
+
+BROKEN = u"""\
+@orphan
+Scenario: before the feature
+Feature: Broken
+  Some description
+
+  Given a loose step
+  Scenario: one
+    Given a step
+      | a | b |
+      | c |
+  Scenario Outline: outline
+    Examples:
+      | x |
+    Given a late step
+  Background: late
+"""
+
+def errors_of(text, **kwargs):
+    return [(error.line, error.column, error.message) for error
+            in Validator().lint(io.StringIO(text), **kwargs)]
+
+@validate.test
+def valid_features_have_no_errors():
+    features = os.path.dirname(get_feature("simple"))
+    for path in glob.glob(os.path.join(features, "*.feature")):
+        with io.open(path, encoding="utf-8") as handle:
+            assert Validator().lint(handle) == []
+
+@validate.test
+def structural_errors_have_positions():
+    assert errors_of(BROKEN) == [
+        (2, 1, "Expected a Feature before scenario"),
+        (6, 3, "Step outside of a Background or Scenario"),
+        (10, 7, "Table row has 1 cells instead of 2"),
+        (14, 5, "Step after the Examples of a Scenario Outline"),
+        (15, 3, "Background must come before the scenarios"),
+    ]
+    assert len(errors_of(BROKEN, limit=2)) == 2
+
+@validate.test
+def unterminated_multiline():
+    text = u'Feature: x\n  Scenario: y\n    Given z\n      """\n  Then w\n'
+    assert errors_of(text) == [(4, 7, 'Unterminated """ block')]
+    text = u'Feature: x\n  Scenario: y\n    """\n    a\n    """\n'
+    assert errors_of(text)[0] == (3, 5, 'A """ block must follow a step')
+
+@validate.test
+def misplaced_text_and_tags():
+    text = (u"Feature: x\n  Scenario: y\n    free description\n"
+            u"    Given z\n    stray text\n  @a @b\n    Given w\n  @c\n")
+    assert errors_of(text) == [
+        (5, 5, "Unexpected text: stray text"),
+        (6, 3, "Tags must precede a feature, scenario or examples"),
+        (8, 3, "Tags must precede a feature, scenario or examples"),
+    ]
+    assert errors_of(u"Feature: x\n  Examples:\n") == [
+        (2, 3, "Examples must follow a Scenario Outline")]
+    assert errors_of(u"# language: xx\nFeature: x\n") == [
+        (1, 1, "Unknown language: # language: xx")]
+
+@validate.test
+def parse_strict():
+    with open(get_feature("complex")) as handle:
+        expected = Parser().parse(handle)
+    with open(get_feature("complex")) as handle:
+        assert dumps(Parser().parse_strict(handle)) == dumps(expected)
+    try:
+        Parser().parse_strict(io.StringIO(BROKEN), "broken.feature")
+    except ParseError as error:
+        assert (error.line, error.column) == (2, 1)
+        assert str(error) == ("broken.feature:2:1: "
+                              "Expected a Feature before scenario")
+    else:
+        assert False, "ParseError not raised"
+
+@validate.test
+def lint_files():
+    features = os.path.dirname(get_feature("simple"))
+    results = lint_paths([os.path.join(features, "*.feature")])
+    assert len(results) == len(glob.glob(os.path.join(features,
+                                                      "*.feature")))
+    assert all(not errors for path, errors in results)
+
+@validate.test
+def lint_skips_the_byte_order_mark():
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "bom.feature")
+        with open(path, "wb") as handle:
+            handle.write(b"\xef\xbb\xbfFeature: Bom\n  Scenario: s\n"
+                         b"    Given a step\n")
+        assert lint_paths([path]) == [(path, [])]
+    finally:
+        shutil.rmtree(directory)
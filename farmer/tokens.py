@@ -0,0 +1,154 @@
+"""
+Farmer's token buffer
+
+A compact store for the parser elements of a source, for keeping the token
+streams of a whole suite in memory. Token kinds are small ints in an
+array('B'), lines are in an array('I'), and keywords and values are indexes
+into a StringTable, which buffers can share so every distinct string of the
+suite is held once. Iterating a buffer yields the usual element tuples, so
+it can be handed to Parser.parse_lex as it is:
+
+    strings = StringTable()
+    buffer = TokenBuffer.from_path("login.feature", strings=strings)
+    features = Parser().parse_lex(buffer)
+"""
+from array import array
+from .lexer import Lexer
+
+KINDS = ("feature", "feature_description", "background", "scenario",
+         "scenario_outline", "examples", "step", "tag", "row", "multiline")
+KIND_CODES = dict((kind, code) for code, kind in enumerate(KINDS))
+# lines are stored shifted by two: 0 is None and 1 the -1 of descriptions
+LINE_SHIFT = 2
+
+
+class StringTable(object):
+    """Strings shared by token buffers, each stored once. None is always
+    at index 0.
+
+    compact() folds the strings into a single text and an array of their
+    offsets, dropping the string objects and the index of them; strings
+    are then sliced out on access. Adding a string to a compacted table
+    unfolds it again.
+    """
+
+    def __init__(self):
+        self.strings = [None]
+        self.indexes = {None: 0}
+        # the compacted form, None while strings and indexes are in use
+        self.text = None
+        self.offsets = None
+
+    def __len__(self):
+        if self.text is not None:
+            return len(self.offsets)
+        return len(self.strings)
+
+    def __getitem__(self, index):
+        if self.text is None:
+            return self.strings[index]
+        if not index:
+            return None
+        return self.text[self.offsets[index - 1]:self.offsets[index]]
+
+    def index(self, value):
+        """Index of value, adding it when it is new"""
+        if self.text is not None:
+            self.expand()
+        try:
+            return self.indexes[value]
+        except KeyError:
+            index = self.indexes[value] = len(self.strings)
+            self.strings.append(value)
+            return index
+
+    def compact(self):
+        offsets = array("I", [0])
+        end = 0
+        for string in self.strings[1:]:
+            end += len(string)
+            offsets.append(end)
+        self.text = u"".join(self.strings[1:])
+        self.offsets = offsets
+        self.strings = self.indexes = None
+
+    def expand(self):
+        self.strings = [self[index] for index in range(len(self))]
+        self.indexes = dict((string, index)
+                            for index, string in enumerate(self.strings))
+        self.text = self.offsets = None
+
+
+class TokenBuffer(object):
+    """The parser elements (keyword, name, key_type, line) of a source,
+    stored in parallel arrays"""
+    __slots__ = ("strings", "kinds", "keywords", "values", "lines")
+
+    def __init__(self, elements=(), strings=None):
+        self.strings = StringTable() if strings is None else strings
+        self.kinds = array("B")
+        self.keywords = array("I")
+        self.values = array("I")
+        self.lines = array("I")
+        self.extend(elements)
+
+    @classmethod
+    def from_source(cls, source, lexer=None, strings=None):
+        """Lex source, an iterable of lines, straight into a buffer"""
+        lexer = lexer or Lexer()
+        return cls(lexer.iter_elements(source), strings)
+
+    @classmethod
+    def from_path(cls, path, lexer=None, strings=None, encoding="utf-8"):
+        """Lex the file at path straight into a buffer"""
+        lexer = lexer or Lexer()
+        return cls(lexer.iter_file_elements(path, encoding), strings)
+
+    def append(self, element):
+        """Add an element; the line may be left out, as Parser.parse_lex
+        allows"""
+        try:
+            kind = KIND_CODES[element[2]]
+        except KeyError:
+            raise ValueError("Unknown token type: %r" % (element[2],))
+        line = element[3] if len(element) > 3 else None
+        index = self.strings.index
+        self.kinds.append(kind)
+        self.keywords.append(index(element[0]))
+        self.values.append(index(element[1]))
+        self.lines.append(0 if line is None else line + LINE_SHIFT)
+
+    def extend(self, elements):
+        for element in elements:
+            self.append(element)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        strings = self.strings
+        line = self.lines[index]
+        return (strings[self.keywords[index]], strings[self.values[index]],
+                KINDS[self.kinds[index]],
+                line - LINE_SHIFT if line else None)
+
+    def __iter__(self):
+        strings = self.strings.strings or self.strings
+        kinds = KINDS
+        for kind, keyword, value, line in zip(self.kinds, self.keywords,
+                                              self.values, self.lines):
+            yield (strings[keyword], strings[value], kinds[kind],
+                   line - LINE_SHIFT if line else None)
+
+    def tokens(self):
+        """Iterate the lexer tokens (key_type, value, line) of the buffer"""
+        strings = self.strings.strings or self.strings
+        kinds = KINDS
+        for kind, value, line in zip(self.kinds, self.values, self.lines):
+            yield (kinds[kind], strings[value],
+                   line - LINE_SHIFT if line else None)
+
+    def nbytes(self):
+        """Bytes taken by the arrays, the string table left out"""
+        return sum(len(values) * values.itemsize for values in (
+            self.kinds, self.keywords, self.values, self.lines))
@@ -0,0 +1,230 @@
+"""
+Farmer's validation
+
+A strict check of the structure of feature files. The lexer skips what it
+does not understand and the tree builder makes do with what it gets; the
+Validator reports those places instead, as ParseErrors carrying the line and
+column they were found at. It runs over the tokens of a single lexer pass
+and builds no nodes, which makes it the cheap way to lint many files, and
+Parser.parse_strict builds the tree from the same pass once it succeeded.
+"""
+import io
+import sys
+from .batch import expand_paths
+from .lexer import Lexer
+from .node import split_row
+
+HEADERS = ("feature", "background", "scenario", "scenario_outline",
+           "examples")
+CONTAINERS = ("background", "scenario", "scenario_outline")
+TAGS_MESSAGE = "Tags must precede a feature, scenario or examples"
+
+
+class ParseError(ValueError):
+    """A structural error of a feature file. line and column count from 1,
+    as editors do."""
+
+    def __init__(self, message, line, column=1, path=None):
+        super(ParseError, self).__init__(message)
+        self.message = message
+        self.line = line
+        self.column = column
+        self.path = path
+
+    def __str__(self):
+        location = "%d:%d" % (self.line, self.column)
+        if self.path is not None:
+            location = "%s:%s" % (self.path, location)
+        return "%s: %s" % (location, self.message)
+
+
+class Validator(object):
+    """Check the structure of a feature source in one pass over its lines"""
+
+    def __init__(self, lexer=None):
+        self.lexer = lexer or Lexer()
+
+    def check(self, source, path=None, elements=None):
+        """Raise the first ParseError of source"""
+        for error in self.errors(source, path, elements):
+            raise error
+
+    def lint(self, source, path=None, limit=None):
+        """List the ParseErrors of source, at most limit of them"""
+        errors = []
+        for error in self.errors(source, path):
+            errors.append(error)
+            if limit is not None and len(errors) >= limit:
+                break
+        return errors
+
+    def errors(self, source, path=None, elements=None):
+        """Yield the ParseErrors of source as they are found. When elements
+        is a list, the parser elements of the source are appended to it."""
+        lexer = self.lexer
+        lexer.start_feed()
+        self.start()
+        tokens = lexer.tokens
+        for raw_line in source:
+            index = lexer.feed_index
+            line = raw_line.strip()
+            column = len(raw_line) - len(raw_line.lstrip()) + 1
+            was_multiline = lexer.should_be_multiline
+            description = len(lexer.current_feature_desc)
+            try:
+                lexer.feed_line(raw_line)
+            except KeyError:
+                yield ParseError("Unknown language: %s" % line, index + 1,
+                                 column, path)
+                return
+            if not line or line[0] == Lexer.COMMENT:
+                continue
+            if tokens:
+                for token in tokens:
+                    if token[0] == "tag":
+                        token_column = raw_line.find("@" + token[1]) + 1
+                    else:
+                        token_column = column
+                    error = self.check_token(token, index + 1, token_column)
+                    if error:
+                        yield ParseError(*error, path=path)
+                if elements is not None:
+                    elements.extend(lexer.pop_elements())
+                else:
+                    del tokens[:]
+            elif lexer.should_be_multiline and not was_multiline:
+                self.multiline = (index + 1, column)
+            elif was_multiline or\
+                    len(lexer.current_feature_desc) > description:
+                continue
+            elif line == '"""':
+                yield ParseError('A """ block must follow a step',
+                                 index + 1, column, path)
+            elif not self.in_description:
+                yield ParseError("Unexpected text: %s" % line, index + 1,
+                                 column, path)
+        lexer.end_feed()
+        if elements is not None:
+            elements.extend(lexer.pop_elements())
+        else:
+            del tokens[:]
+        if lexer.should_be_multiline:
+            line, column = self.multiline
+            yield ParseError('Unterminated """ block', line, column, path)
+        if self.tags:
+            line, column = self.tags
+            yield ParseError(TAGS_MESSAGE, line, column, path)
+
+    def start(self):
+        # whether a feature header was seen, and its background or scenarios
+        self.feature = False
+        self.background = False
+        self.scenarios = False
+        # key type of the current background or scenario, and whether it is
+        # an outline that had Examples already
+        self.container = None
+        self.examples = False
+        # key type of the last element
+        self.last = None
+        # free text is a description right after a header
+        self.in_description = False
+        # (line, column) of the first pending tag and of the open """
+        self.tags = None
+        self.multiline = None
+        # number of cells of the rows of the current table
+        self.width = None
+
+    def check_token(self, token, line, column):
+        """Update the structure with token, returning (message, line,
+        column) when it does not fit in"""
+        key_type = token[0]
+        if key_type == "feature_description":
+            return None
+        last = self.last
+        self.last = key_type
+        self.in_description = key_type in HEADERS
+        if key_type == "tag":
+            if self.tags is None:
+                self.tags = (line, column)
+            return None
+        tags = self.tags
+        self.tags = None
+        if tags and key_type not in HEADERS:
+            return (TAGS_MESSAGE,) + tags
+        message = self.check_structure(key_type, token[1], last)
+        if message:
+            return message, line, column
+        return None
+
+    def check_structure(self, key_type, value, last):
+        if key_type == "row":
+            cells = len(split_row(value))
+            if last == "row":
+                if cells != self.width:
+                    return "Table row has %d cells instead of %d" % (
+                        cells, self.width)
+            elif last in ("step", "examples"):
+                self.width = cells
+            else:
+                return "Table row must follow a step or Examples"
+            return None
+        if key_type == "feature":
+            self.feature = True
+            self.background = self.scenarios = False
+            self.container = None
+            return None
+        if not self.feature:
+            return "Expected a Feature before %s" % key_type
+        if key_type in CONTAINERS:
+            self.container = key_type
+            self.examples = False
+            if key_type != "background":
+                self.scenarios = True
+            elif self.background:
+                return "A feature has a single Background"
+            elif self.scenarios:
+                self.background = True
+                return "Background must come before the scenarios"
+            else:
+                self.background = True
+        elif key_type == "examples":
+            if self.container != "scenario_outline":
+                return "Examples must follow a Scenario Outline"
+            self.examples = True
+        elif key_type == "step":
+            if self.container is None:
+                return "Step outside of a Background or Scenario"
+            if self.examples:
+                return "Step after the Examples of a Scenario Outline"
+        return None
+
+
+def lint_paths(paths_or_globs, lang="en", limit=None):
+    """Lint every feature file matched by paths_or_globs, returning a list
+    of (path, errors)"""
+    results = []
+    for path in expand_paths(paths_or_globs):
+        validator = Validator(Lexer(lang))
+        try:
+            with io.open(path, encoding="utf-8-sig") as handle:
+                errors = validator.lint(handle, path, limit)
+        except (IOError, UnicodeDecodeError) as error:
+            errors = [ParseError(str(error), 1, 1, path)]
+        results.append((path, errors))
+    return results
+
+
+def main(argv=None):
+    """Lint the files given on the command line; exits with 1 when any of
+    them has errors"""
+    argv = sys.argv[1:] if argv is None else argv
+    failed = False
+    for path, errors in lint_paths(argv):
+        for error in errors:
+            failed = True
+            print(error)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())